@@ -2,7 +2,10 @@ import os
 import hmac
 import hashlib
 import secrets
+import threading
 from base64 import urlsafe_b64encode
+from dataclasses import dataclass
+from typing import Iterable, List, Optional
 from cryptography.fernet import Fernet
 
 # ==========================================
@@ -20,6 +23,18 @@ ALPHABET = "ABCDEFGHJKMNPQRSTUVWXYZ23456789"
 # KEY LOADING
 # ==========================================
 
+@dataclass(frozen=True)
+class _KeyMaterial:
+    version: int
+    master_key: bytes
+    hmac_base: "hmac.HMAC"   # keyed once; copy() per code skips re-keying
+    fernet: Fernet
+
+
+_key_lock = threading.Lock()
+_key_material: Optional[_KeyMaterial] = None
+
+
 def _load_master_key() -> bytes:
     if not ACCESS_CODE_KEY_PATH:
         raise RuntimeError("ACCESS_CODE_KEY_PATH not set")
@@ -40,10 +55,54 @@ def _derive_fernet_key(master_key: bytes) -> bytes:
     return urlsafe_b64encode(digest)
 
 
-def _get_fernet() -> Fernet:
+def _build_key_material() -> _KeyMaterial:
     master_key = _load_master_key()
-    fernet_key = _derive_fernet_key(master_key)
-    return Fernet(fernet_key)
+    return _KeyMaterial(
+        version=ACCESS_CODE_KEY_VERSION,
+        master_key=master_key,
+        hmac_base=hmac.new(master_key, digestmod=hashlib.sha256),
+        fernet=Fernet(_derive_fernet_key(master_key)),
+    )
+
+
+def _get_key_material() -> _KeyMaterial:
+    """Key file is read once per process (and again only on reload/rotation)."""
+    global _key_material
+    km = _key_material
+    if km is not None:
+        return km
+
+    with _key_lock:
+        if _key_material is None:
+            _key_material = _build_key_material()
+        return _key_material
+
+
+def reload_key_material(key_path: Optional[str] = None, key_version: Optional[int] = None) -> int:
+    """
+    Re-read the master key, e.g. after rotating the key file.
+    Path and version default to the current ACCESS_CODE_KEY_PATH /
+    ACCESS_CODE_KEY_VERSION environment variables. Returns the active version.
+    """
+    global ACCESS_CODE_KEY_PATH, ACCESS_CODE_KEY_VERSION, _key_material
+
+    with _key_lock:
+        ACCESS_CODE_KEY_PATH = key_path or os.getenv("ACCESS_CODE_KEY_PATH")
+        ACCESS_CODE_KEY_VERSION = (
+            key_version if key_version is not None
+            else int(os.getenv("ACCESS_CODE_KEY_VERSION", "1"))
+        )
+        _key_material = _build_key_material()
+        return _key_material.version
+
+
+def current_key_version() -> int:
+    """Version of the key used by compute_hmac / encrypt_code (stored as access_code_key_version)."""
+    return _get_key_material().version
+
+
+def _get_fernet() -> Fernet:
+    return _get_key_material().fernet
 
 
 # ==========================================
@@ -64,11 +123,20 @@ def normalize_access_code(code: str) -> str:
 # STORAGE TRANSFORMS
 # ==========================================
 
+def _hmac_hex(km: _KeyMaterial, code: str) -> str:
+    h = km.hmac_base.copy()
+    h.update(normalize_access_code(code).encode("utf-8"))
+    return h.hexdigest()
+
+
 def compute_hmac(code: str) -> str:
-    master_key = _load_master_key()
-    normalized = normalize_access_code(code).encode("utf-8")
+    return _hmac_hex(_get_key_material(), code)
+
 
-    return hmac.new(master_key, normalized, hashlib.sha256).hexdigest()
+def compute_hmac_many(codes: Iterable[str]) -> List[str]:
+    """compute_hmac for a batch, in input order, with one key lookup."""
+    km = _get_key_material()
+    return [_hmac_hex(km, c) for c in codes]
 
 
 def encrypt_code(code: str) -> str:
@@ -77,6 +145,12 @@ def encrypt_code(code: str) -> str:
     return f.encrypt(normalized).decode("utf-8")
 
 
+def encrypt_codes(codes: Iterable[str]) -> List[str]:
+    """encrypt_code for a batch, in input order, with one key lookup."""
+    f = _get_fernet()
+    return [f.encrypt(normalize_access_code(c).encode("utf-8")).decode("utf-8") for c in codes]
+
+
 def decrypt_code(token: str) -> str:
     f = _get_fernet()
     return f.decrypt(token.encode("utf-8")).decode("utf-8")
@@ -1,5 +1,5 @@
 import os
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Iterable, Iterator, Tuple
 
 import streamlit as st
 from openai import OpenAI
@@ -13,14 +13,23 @@ from fpdf import FPDF
 import urllib.parse
 import html
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # For gated access
 
 from datetime import datetime, timedelta, timezone
 import secrets
-import psycopg
 
 from access_codes import compute_hmac, normalize_access_code
+from db import get_pool
+from session_cache import get_cached_session, cache_session, invalidate_token
+from last_seen import touch_session
+from usage_events import enqueue_event
+from estimate_diff import format_changed_lines
+from estimate_excerpt import build_estimate_excerpt
+from estimate_scan import scan_estimate_text
+from keyword_index import KeywordIndex
+from line_items import merge_line_items
 
 
 
@@ -579,6 +588,10 @@ DESIGN_HELPER = "design_helper"
 
 
 def log_event(event_type: str, metadata: dict | None = None):
+    """
+    Queue a usage event; a background writer (usage_events.py) inserts it.
+    Never blocks the UI on the database.
+    """
     try:
         contractor_id = st.session_state.get("contractor_id")
         session_id = st.session_state.get("session_id")
@@ -586,20 +599,8 @@ def log_event(event_type: str, metadata: dict | None = None):
         if not contractor_id or not session_id:
             return
 
-        with _db_conn() as conn:
-            with conn.cursor() as cur:
-                cur.execute(
-                    """
-                    INSERT INTO usage_events (contractor_id, session_id, event_type, metadata)
-                    VALUES (%s, %s, %s, %s)
-                    """,
-                    (
-                        contractor_id,
-                        session_id,
-                        event_type,
-                        psycopg.types.json.Jsonb(metadata or {}),  # ← fix
-                    )
-                )
+        if not enqueue_event(contractor_id, session_id, event_type, metadata):
+            print(f"Usage logging queue full; dropped {event_type}")
 
     except Exception as e:
         print(f"Usage logging error for {event_type}: {e}")
@@ -613,29 +614,11 @@ SESSION_DAYS = int(os.getenv("SESSION_DAYS", "30"))
 
 def _db_conn():
     """
-    Connect to Postgres through cloudsql-proxy. Uses either DATABASE_URL
-    or DB_* environment variables.
+    Borrow an autocommit connection from the process-wide pool (db.get_pool).
+    Use as `with _db_conn() as conn:`; the connection goes back to the pool
+    on exit instead of being closed.
     """
-    dsn = os.getenv("DATABASE_URL")
-    if dsn:
-        return psycopg.connect(dsn, autocommit=True)
-
-    host = os.getenv("DB_HOST", "cloudsql-proxy")
-    port = int(os.getenv("DB_PORT", "5432"))
-    name = os.getenv("DB_NAME", "contractor_prod")
-    user = os.getenv("DB_USER", "contractor_app")
-    password = os.getenv("DB_PASSWORD")
-    if not password:
-        raise RuntimeError("DB_PASSWORD is not set")
-
-    return psycopg.connect(
-        host=host,
-        port=port,
-        dbname=name,
-        user=user,
-        password=password,
-        autocommit=True,
-    )
+    return get_pool().connection()
 
 
 def _validate_session(session_token: str) -> int | None:
@@ -646,11 +629,23 @@ def _validate_session(session_token: str) -> int | None:
       - active => allow
       - trial  => allow only if trial_ends_at not null and now() < trial_ends_at
       - else   => deny
+
+    Valid sessions are cached in-process (session_cache) until the TTL, the
+    session's expires_at or the trial end, whichever comes first.
     """
+    cached = get_cached_session(session_token)
+    if cached is not None:
+        st.session_state["session_id"] = cached.session_id
+        touch_session(cached.session_id)
+        return cached.contractor_id
+
     q = """
         SELECT
             s.id AS session_id,
-            s.contractor_id
+            s.contractor_id,
+            s.expires_at,
+            c.subscription_status,
+            c.trial_ends_at
         FROM public.client_sessions s
         JOIN public.contractors c
           ON c.id = s.contractor_id
@@ -670,19 +665,24 @@ def _validate_session(session_token: str) -> int | None:
             cur.execute(q, (session_token,))
             row = cur.fetchone()
             if not row:
+                invalidate_token(session_token)
                 st.session_state.pop("session_id", None)
                 return None
 
-            session_id, contractor_id = row
+            session_id, contractor_id, expires_at, status, trial_ends_at = row
+            cache_session(
+                session_token,
+                session_id=int(session_id),
+                contractor_id=int(contractor_id),
+                expires_at=expires_at,
+                entitlement_ends_at=trial_ends_at if status == "trial" else None,
+            )
 
             # Store validated session id for usage logging
             st.session_state["session_id"] = int(session_id)
 
-            # Optional hygiene update (consider throttling later)
-            cur.execute(
-                "UPDATE public.client_sessions SET last_seen_at = now() WHERE id = %s",
-                (session_id,),
-            )
+            # Hygiene update: batched + throttled by the last_seen flusher
+            touch_session(int(session_id))
             return int(contractor_id)
 
 
@@ -894,6 +894,180 @@ Translate the following text from English to neutral, clear Spanish.
     return translated.output_text
 
 
+def stream_gpt(
+    system_prompt: str,
+    user_content: str,
+    model: str | None = None,
+    max_output_tokens: int = 800,
+    temperature: float | None = None,
+) -> Iterator[str]:
+    """
+    Same request as call_gpt, streamed. Yields output text deltas as they arrive.
+    """
+    stream = client.responses.create(
+        model=model or DEFAULT_MODEL,
+        instructions=system_prompt,
+        input=user_content,
+        max_output_tokens=max_output_tokens,
+        store=False,
+        stream=True,
+        **({"temperature": temperature} if temperature is not None else {}),
+    )
+    for event in stream:
+        if event.type == "response.output_text.delta":
+            yield event.delta
+
+
+STREAM_RENDER_INTERVAL_S = 0.05  # throttle placeholder redraws while streaming
+
+
+def _timed_stream(deltas: Iterable[str], label: str, placeholder=None) -> Iterator[str]:
+    """
+    Pass deltas through, logging time-to-first-token and total time.
+    If a placeholder is given, render the text so far into it with the same
+    dash normalization + markdown sanitizing used on finished answers.
+    """
+    t0 = time.perf_counter()
+    ttft = None
+    parts: List[str] = []
+    last_render = 0.0
+
+    for delta in deltas:
+        now = time.perf_counter()
+        if ttft is None:
+            ttft = now - t0
+        parts.append(delta)
+
+        if placeholder is not None and now - last_render >= STREAM_RENDER_INTERVAL_S:
+            preview = "".join(parts).replace("–", "-").replace("—", "-")
+            placeholder.markdown(sanitize_for_streamlit_markdown(preview) + " ▌")
+            last_render = now
+        yield delta
+
+    if placeholder is not None and parts:
+        preview = "".join(parts).replace("–", "-").replace("—", "-")
+        placeholder.markdown(sanitize_for_streamlit_markdown(preview))
+
+    total = time.perf_counter() - t0
+    print(f"[TIMING] {label}: ttft={ttft if ttft is not None else total:.2f}s total={total:.2f}s")
+
+
+def call_gpt_streaming(
+    system_prompt: str,
+    user_content: str,
+    placeholder=None,
+    model: str | None = None,
+    max_output_tokens: int = 800,
+    temperature: float | None = None,
+    label: str = "call_gpt_streaming",
+) -> str:
+    """
+    Streaming drop-in for call_gpt: tokens render into `placeholder` (an st.empty())
+    as they arrive, and the full raw text is returned, so callers keep their
+    existing post-processing.
+    """
+    deltas = stream_gpt(
+        system_prompt,
+        user_content,
+        model=model,
+        max_output_tokens=max_output_tokens,
+        temperature=temperature,
+    )
+    return "".join(_timed_stream(deltas, label, placeholder))
+
+
+def iter_streamed_sections(deltas: Iterable[str]) -> Iterator[str]:
+    """
+    Regroup streamed text into sections, using the same bold-only heading
+    boundaries as split_by_bold_headings(). A section is yielded as soon as the
+    next heading line arrives; the last one when the stream ends.
+    """
+    current: List[str] = []
+    pending = ""
+
+    for delta in deltas:
+        pending += delta
+        *complete, pending = pending.split("\n")
+        for line in complete:
+            if BOLD_HEADING_LINE_RE.match(line.strip()) and "\n".join(current).strip():
+                yield "\n".join(current)
+                current = []
+            current.append(line)
+
+    if pending:
+        current.append(pending)
+    if "\n".join(current).strip():
+        yield "\n".join(current)
+
+
+def explain_with_overlapped_translation(
+    system_prompt: str,
+    user_content: str,
+    target_lang_code: str,
+    *,
+    model: str | None = None,
+    max_output_tokens: int = 800,
+    temperature: float | None = None,
+    translation_placeholder=None,
+    english_placeholder=None,
+) -> Tuple[str, Optional[str]]:
+    """
+    Stream the English answer and translate each finished section while the
+    rest is still generating, instead of one translation call at the end.
+
+    Returns (english_answer, translated_answer_or_None). The English answer is
+    dash-normalized and sanitized exactly as the non-streaming path does.
+    If placeholders are given, the English text streams into english_placeholder
+    and translated sections render into translation_placeholder in order.
+    """
+    deltas = _timed_stream(
+        stream_gpt(
+            system_prompt,
+            user_content,
+            model=model,
+            max_output_tokens=max_output_tokens,
+            temperature=temperature,
+        ),
+        "estimate explanation",
+        english_placeholder,
+    )
+
+    if target_lang_code != "es":
+        # translate_if_needed only handles EN -> ES; nothing to overlap
+        english = "".join(deltas)
+        return sanitize_for_streamlit_markdown(english.replace("–", "-").replace("—", "-")), None
+
+    english_parts: List[str] = []
+    futures = []
+    translated: List[str] = []
+
+    def render_ready():
+        # Render the contiguous prefix of finished translations
+        while len(translated) < len(futures) and futures[len(translated)].done():
+            translated.append((futures[len(translated)].result() or "").strip())
+            if translation_placeholder is not None:
+                translation_placeholder.markdown(
+                    "### Spanish Translation\n\n" + "\n\n".join(translated)
+                )
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        for section in iter_streamed_sections(deltas):
+            english_parts.append(section)
+            clean = sanitize_for_streamlit_markdown(section.replace("–", "-").replace("—", "-"))
+            if clean:
+                futures.append(pool.submit(translate_if_needed, clean, target_lang_code))
+            render_ready()
+
+        for fut in futures[len(translated):]:
+            fut.result()
+        render_ready()
+
+    english = "\n".join(english_parts)
+    english = sanitize_for_streamlit_markdown(english.replace("–", "-").replace("—", "-"))
+    translated_answer = "\n\n".join(t for t in translated if t) or None
+    return english, translated_answer
+
+
 # DEPRECATED: No longer used - switched to pdfplumber text extraction
 def build_estimate_pdf_content(
     insurance_files: List, contractor_files: List, extra_notes: str
@@ -1180,78 +1354,6 @@ def split_by_bold_headings(text: str) -> List[Tuple[Optional[str], str]]:
 # ROOM TOTALS (EXPLICIT FROM PDF)
 #============================
 
-import re
-from typing import Dict, Tuple
-
-ROOM_TOTAL_LINE_RE = re.compile(r"^\s*Totals:\s*(.+?)\s+(.*)$")
-MONEY_RE = re.compile(r"(\d{1,3}(?:,\d{3})*(?:\.\d{2})|\d+(?:\.\d{2}))")
-
-# things that show up as "Totals:" but are NOT rooms
-NON_ROOM_TOTAL_LABELS = {
-    "Labor Minimums Applied",
-    "Line Item Totals",
-    "Recap of Taxes, Overhead and Profit",
-}
-
-# floor/sketch groupings (extra guard even though we ignore Area Totals already)
-NON_ROOM_NAME_EXACT = {
-    "Main Level",
-    "First Floor",
-    "Second Floor",
-    "Upper Level",
-    "Lower Level",
-    "Labor",
-}
-NON_ROOM_PREFIXES = ("SKETCH",)
-
-def extract_room_totals_from_text(extracted_text: str) -> Dict[str, str]:
-    """
-    Extract explicitly-provided room totals from estimate text.
-
-    Returns: {room_name: "$1,234.56"}  (keeps original comma formatting)
-    Only trusts lines that start with "Totals:" and have a clear final numeric total.
-    """
-    if not extracted_text:
-        return {}
-
-    out: Dict[str, str] = {}
-
-    for raw_line in extracted_text.splitlines():
-        line = raw_line.strip()
-        if not line.startswith("Totals:"):
-            continue
-
-        m = ROOM_TOTAL_LINE_RE.match(line)
-        if not m:
-            continue
-
-        room = m.group(1).strip()
-
-        # Reject known non-room labels
-        if room in NON_ROOM_TOTAL_LABELS:
-            continue
-
-        # Reject floor/group labels if they ever appear under Totals:
-        if room in NON_ROOM_NAME_EXACT:
-            continue
-        if any(room.upper().startswith(pfx) for pfx in NON_ROOM_PREFIXES):
-            continue
-
-        # Find numeric tokens on the rest of the line; use the LAST one as the total.
-        rest = m.group(2)
-        nums = MONEY_RE.findall(rest)
-        if not nums:
-            continue
-
-        total_str = nums[-1]  # last number on the line is the total in your PDF
-        # Ensure it looks like dollars+ cents OR at least a plausible number; keep as displayed.
-        # If you want strict cents: require '.' in total_str and len after dot == 2.
-
-        # Re-add "$" for display consistency (your text sometimes omits $)
-        out[room] = f"${total_str}"
-
-    return out
-
 def build_room_totals_block(room_totals: dict, *, doc_role: str, doc_name: str) -> str:
     # Return empty string if nothing found
     if not room_totals:
@@ -1272,89 +1374,6 @@ def build_room_totals_block(room_totals: dict, *, doc_role: str, doc_name: str)
 # SUMMARY NUMBERS FROM ESTIMATE PDF
 #=======================
 
-_MONEY_RE = re.compile(r"\$?\s*(\d{1,3}(?:,\d{3})*(?:\.\d{2})|\d+(?:\.\d{2}))")
-
-def _money_from_line(line: str) -> Optional[str]:
-    """Return the first money-like token in the line as a display string with $."""
-    m = _MONEY_RE.search(line)
-    if not m:
-        return None
-    amt = m.group(1)
-    return f"${amt}"
-
-def extract_key_numbers_from_text(extracted_text: str) -> Dict[str, str]:
-    """
-    Extract key summary numbers from estimate text.
-    Only returns values that are explicitly labeled in the text.
-
-    Output keys are human-facing labels:
-      - Replacement Cost Value (RCV)
-      - Actual Cash Value (ACV)
-      - Depreciation
-      - Deductible
-      - Overhead & Profit
-      - Sales Tax
-      - Net Claim
-      - Net Payment   (ONLY if payment language is explicitly present)
-    """
-    if not extracted_text:
-        return {}
-
-    lines = [ln.strip() for ln in extracted_text.splitlines() if ln.strip()]
-    out: Dict[str, str] = {}
-
-    # -----------------------------
-    # Label patterns (case-insensitive)
-    # -----------------------------
-    # IMPORTANT: Keep Net Claim and Net Payment separate.
-    # - "Net Claim" stays "Net Claim"
-    # - "Net Payment" ONLY when explicit payment language exists
-    patterns = [
-        (re.compile(r"\b(replacement cost value|rcv)\b", re.I), "Replacement Cost Value (RCV)"),
-        (re.compile(r"\b(actual cash value|acv)\b", re.I), "Actual Cash Value (ACV)"),
-        (re.compile(r"\bdepreciation\b", re.I), "Depreciation"),
-        (re.compile(r"\bdeductible\b", re.I), "Deductible"),
-
-        # Net Claim (explicit claim language)
-        (re.compile(r"\bnet\b.*\bclaim\b", re.I), "Net Claim"),
-
-        # Net Payment (explicit payment language only)
-        (re.compile(r"\bnet\b.*\b(payment|paid|check|disbursement)\b", re.I), "Net Payment"),
-
-        # Overhead & Profit: require explicit O&P wording (do NOT match "Line Item Totals")
-        (re.compile(r"\b(overhead\s*&\s*profit|overhead\s+and\s+profit|\bo\s*&\s*p\b)\b", re.I), "Overhead & Profit"),
-
-        # Sales Tax: only match if "sales tax" appears (avoid generic "tax" lines like recap/total tax)
-        (re.compile(r"\bsales\s*tax\b", re.I), "Sales Tax"),
-    ]
-
-    # Skip lines that often contain amounts but are NOT the key numbers we want
-    skip_rx = re.compile(
-        r"\b(page|subtotal by room|totals:|line item totals|labor minimums applied|recap of taxes)\b",
-        re.I,
-    )
-
-    # We’ll take the LAST matching occurrence (often the most final summary)
-    for line in lines:
-        # quick skip: if no digits at all, it can't contain an amount
-        if not any(ch.isdigit() for ch in line):
-            continue
-
-        if skip_rx.search(line):
-            continue
-
-        amt = _money_from_line(line)
-        if not amt:
-            continue
-
-        for rx, label in patterns:
-            if rx.search(line):
-                out[label] = amt
-                break
-
-    return out
-
-
 def build_key_numbers_block(key_numbers: Dict[str, str], *, doc_role: str, doc_name: str) -> str:
     if not key_numbers:
         return ""
@@ -1386,6 +1405,59 @@ def build_key_numbers_block(key_numbers: Dict[str, str], *, doc_role: str, doc_n
         + "\n=========================================================="
     )
 
+#========================
+# COLUMN TOTALS BY CATEGORY (RCV / O&P / DEPRECIATION / ACV)
+#=======================
+
+COLUMN_TOTAL_LABELS = [
+    ("rcv", "RCV"),
+    ("tax", "Tax"),
+    ("o_and_p", "O&P"),
+    ("depreciation", "Depreciation"),
+    ("acv", "ACV"),
+]
+
+def build_column_totals_block(column_totals: Dict[str, Dict], *, doc_role: str, doc_name: str) -> str:
+    lines = []
+    for bucket, totals in column_totals.items():
+        parts = [f"{label} ${totals[field]:,.2f}" for field, label in COLUMN_TOTAL_LABELS if totals.get(field)]
+        if parts:
+            lines.append(f"{bucket}: " + ", ".join(parts))
+
+    if not lines:
+        return ""
+
+    return (
+        "=== COLUMN TOTALS BY CATEGORY (COMPUTED — DO NOT MODIFY) ===\n"
+        f"DOCUMENT: {doc_role.upper()} — {doc_name}\n"
+        + "\n".join(lines)
+        + "\n=========================================================="
+    )
+
+#========================
+# CHANGES VS PREVIOUS UPLOAD (REVISED ESTIMATE)
+#=======================
+
+def build_estimate_changes_block(result: Dict, *, doc_role: str, doc_name: str) -> str:
+    diff = result.get("diff")
+    if diff is None or not diff.is_revision or not diff.has_changes:
+        return ""
+
+    bucket_map = result["bucket_map"]
+    deltas = result.get("bucket_deltas", {})
+    delta_lines = [f"{bucket}: {'+' if amt > 0 else '-'}${abs(amt):,.2f}" for bucket, amt in deltas.items()]
+
+    return (
+        "=== CHANGES SINCE PREVIOUS UPLOAD (COMPUTED — DO NOT MODIFY) ===\n"
+        f"DOCUMENT: {doc_role.upper()} — {doc_name}\n"
+        f"{diff.unchanged} lines unchanged, {len(diff.changed)} re-priced, "
+        f"{len(diff.added)} added, {len(diff.removed)} removed\n"
+        + ("NET CHANGE BY CATEGORY:\n" + "\n".join(delta_lines) + "\n" if delta_lines else "")
+        + "CHANGED LINES:\n"
+        + "\n".join(format_changed_lines(diff, bucket_map))
+        + "\n=========================================================="
+    )
+
 # ======================
 # HOME AI CHAT PROMPT
 # ======================
@@ -1721,28 +1793,36 @@ def estimate_explainer_tab(preferred_lang: Dict):
 
 
         with st.spinner("I'm working through your estimate now. This usually takes about 20–30 seconds."):
-            # Store PDFs as bytes for follow-ups
-            st.session_state["estimate_insurance_pdfs"] = [
-                {"name": f.name, "type": f.type, "bytes": f.getvalue()}
-                for f in (insurance_files or [])
-            ]
-
-            st.session_state["estimate_contractor_pdfs"] = [
-                {"name": f.name, "type": f.type, "bytes": f.getvalue()}
-                for f in (contractor_files or [])
-            ]
-
             # Extract text with pdfplumber (per-document)
-            from estimate_extract import extract_pdf_pages_text, join_page_packets, redact_estimate_text
+            from estimate_extract import extract_redacted_pdfs, join_page_packets, line_items_from_packets
+            from extract_cache import pdf_digest
             from material_totals import compute_material_totals
 
+            uploads = (
+                [("insurance", f) for f in (insurance_files or [])]
+                + [("contractor", f) for f in (contractor_files or [])]
+            )
+
             # ====================
-            # FILE SIGNATURE (for caching)
+            # FILE SIGNATURE (for caching) — content hash, not (name, size)
             # ====================
-            current_files_sig = sorted(
-                [(f.name, len(f.getvalue())) for f in (insurance_files or [])] +
-                [(f.name, len(f.getvalue())) for f in (contractor_files or [])]
-            )
+            upload_digests = [pdf_digest(f.getvalue()) for _, f in uploads]
+            current_files_sig = [
+                (role, f.name, digest) for (role, f), digest in zip(uploads, upload_digests)
+            ]
+
+            # Keep only PDF metadata + content hash for follow-ups (no raw bytes in session).
+            # Follow-ups read the redacted text in estimate_extracted_docs, or the
+            # on-disk extraction cache by sha256 if that's gone.
+            st.session_state["estimate_insurance_pdfs"] = [
+                {"name": f.name, "type": f.type, "sha256": digest}
+                for (role, f), digest in zip(uploads, upload_digests) if role == "insurance"
+            ]
+
+            st.session_state["estimate_contractor_pdfs"] = [
+                {"name": f.name, "type": f.type, "sha256": digest}
+                for (role, f), digest in zip(uploads, upload_digests) if role == "contractor"
+            ]
 
             prev_files_sig = st.session_state.get("estimate_uploaded_file_sig")
             already_extracted = bool(st.session_state.get("estimate_extracted_docs"))
@@ -1770,46 +1850,33 @@ def estimate_explainer_tab(preferred_lang: Dict):
                 # Files changed (or no cache yet) → extract again
                 st.session_state["estimate_uploaded_file_sig"] = current_files_sig
 
-                docs = []  # list of {"role": "insurance"|"contractor", "name": str, "text": str}
+                docs = []  # list of {"role": "insurance"|"contractor", "name": str, "text": str, "line_items": [...]}
                 all_extracted_text = ""
 
                 # ==============================
-                # Extract from insurance files
+                # Extract all files: shared on-disk cache first, then one
+                # process pool for the misses (pages split across workers)
                 # ==============================
-                for f in (insurance_files or []):
-                    t0 = time.perf_counter()
-                    packets = extract_pdf_pages_text(f.getvalue())
-                    block = join_page_packets(packets)
-                    block = redact_estimate_text(block)
-                    t1 = time.perf_counter()
-
-                    elapsed = t1 - t0
-                    pdf_time += elapsed
-                    print(f"[TIMING] pdfplumber extraction ({f.name}): {elapsed:.2f}s")
+                t0 = time.perf_counter()
+                packets_by_file = extract_redacted_pdfs(
+                    [f.getvalue() for _, f in uploads],
+                    digests=upload_digests,
+                )
+                t1 = time.perf_counter()
 
-                    docs.append({"role": "insurance", "name": f.name, "text": block})
-                    all_extracted_text += f"\n\n=== INSURANCE ESTIMATE: {f.name} ===\n\n{block}"
+                pdf_time = t1 - t0
+                print(f"[TIMING] pdfplumber extraction ({len(uploads)} files): {pdf_time:.2f}s")
 
-                # ==============================
-                # Extract from contractor files
-                # ==============================
-                for f in (contractor_files or []):
-                    t0 = time.perf_counter()
-                    packets = extract_pdf_pages_text(f.getvalue())
-                    block = join_page_packets(packets)
-                    block = redact_estimate_text(block)
-                    t1 = time.perf_counter()
+                for (role, f), packets in zip(uploads, packets_by_file):
+                    block = join_page_packets(packets)  # packets are already redacted
 
-                    elapsed = t1 - t0
-                    pdf_time += elapsed
-                    print(f"[TIMING] pdfplumber extraction ({f.name}): {elapsed:.2f}s")
-
-                    docs.append({"role": "contractor", "name": f.name, "text": block})
-                    all_extracted_text += f"\n\n=== CONTRACTOR ESTIMATE: {f.name} ===\n\n{block}"
+                    # Column-assigned rows (PDF_EXTRACT_MODE=table); empty in text mode
+                    docs.append({"role": role, "name": f.name, "text": block, "line_items": line_items_from_packets(packets)})
+                    all_extracted_text += f"\n\n=== {role.upper()} ESTIMATE: {f.name} ===\n\n{block}"
 
                 # Cache extracted text for downstream tabs (e.g., Renovation)
                 st.session_state["estimate_extracted_docs"] = [
-                    {"role": d["role"], "name": d["name"], "text": d["text"]}
+                    {"role": d["role"], "name": d["name"], "text": d["text"], "line_items": d["line_items"]}
                     for d in docs
                 ]
                 st.session_state["estimate_all_extracted_text"] = all_extracted_text
@@ -1823,16 +1890,61 @@ def estimate_explainer_tab(preferred_lang: Dict):
             totals_blocks = []
             room_totals_blocks = []
             key_numbers_blocks = []
+            column_totals_blocks = []
+            changes_blocks = []
+
+            # Previous run per (role, position within role): a re-upload of a
+            # revised estimate only re-buckets lines that changed
+            previous_by_slot = {}
+            role_counts = {}
+            for mr in st.session_state.get("material_totals_by_doc", []):
+                slot = (mr["role"], role_counts.get(mr["role"], 0))
+                role_counts[mr["role"]] = slot[1] + 1
+                previous_by_slot[slot] = mr["result"]
+
+            def analyze_doc(d, previous=None):
+                # Runs on a worker thread: no st.* calls in here.
+                # One pass over the text yields money lines, room totals and key numbers.
+                scan = scan_estimate_text(d["text"])
+                return {
+                    "result": compute_material_totals(
+                        client=client,
+                        model=BUCKET_MODEL,
+                        extracted_text=d["text"],
+                        money_lines=scan.money_lines,
+                        previous=previous,
+                        line_items=merge_line_items(scan.line_items, d.get("line_items") or []),
+                    ),
+                    "room_totals": scan.room_totals,
+                    "key_numbers": scan.key_numbers,
+                }
+
+            # Fan out per document (bucketing LLM calls overlap), join in doc order
+            docs_to_analyze = [d for d in docs if d["text"].strip()]
+            analyses = [None] * len(docs_to_analyze)
+
+            previous_results = []
+            role_counts = {}
+            for d in docs_to_analyze:
+                slot = (d["role"], role_counts.get(d["role"], 0))
+                role_counts[d["role"]] = slot[1] + 1
+                previous_results.append(previous_by_slot.get(slot))
+
+            if docs_to_analyze:
+                t0 = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=len(docs_to_analyze)) as pool:
+                    futures = {
+                        pool.submit(analyze_doc, d, previous_results[i]): i
+                        for i, d in enumerate(docs_to_analyze)
+                    }
+                    for done, fut in enumerate(as_completed(futures), start=1):
+                        analyses[futures[fut]] = fut.result()
+                        # Advance within step 2 as each document finishes
+                        progress_bar.progress((2 + done / len(docs_to_analyze)) / 4)
+                print(f"[TIMING] per-document analysis ({len(docs_to_analyze)} docs): {time.perf_counter() - t0:.2f}s")
 
-            for d in docs:
-                if not d["text"].strip():
-                    continue
-
-                result = compute_material_totals(
-                    client=client,
-                    model=BUCKET_MODEL,
-                    extracted_text=d["text"],
-                )
+            for d, analysis in zip(docs_to_analyze, analyses):
+                result = analysis["result"]
 
                 labeled_totals_block = (
                     "=== COMPUTED TOTALS (GROUND TRUTH — DO NOT MODIFY) ===\n"
@@ -1866,18 +1978,30 @@ def estimate_explainer_tab(preferred_lang: Dict):
                 bucket_time += timings.get("bucketing_llm_s", 0.0)
 
                 # ROOM TOTALS
-                room_totals = extract_room_totals_from_text(d["text"])
+                room_totals = analysis["room_totals"]
                 if room_totals:
                     room_block = build_room_totals_block(room_totals, doc_role=d["role"], doc_name=d["name"])
                     if room_block:
                         room_totals_blocks.append(room_block)
 
                 # KEY NUMBERS (summary-page figures like RCV, deductible, net payment)
-                key_numbers = extract_key_numbers_from_text(d["text"])
+                key_numbers = analysis["key_numbers"]
                 key_block = build_key_numbers_block(key_numbers, doc_role=d["role"], doc_name=d["name"])
                 if key_block:
                     key_numbers_blocks.append(key_block)
 
+                # COLUMN TOTALS (per-category RCV / O&P / depreciation / ACV from typed line item rows)
+                column_block = build_column_totals_block(
+                    result.get("column_totals") or {}, doc_role=d["role"], doc_name=d["name"]
+                )
+                if column_block:
+                    column_totals_blocks.append(column_block)
+
+                # CHANGES VS PREVIOUS UPLOAD (only for a revision of the same estimate)
+                changes_block = build_estimate_changes_block(result, doc_role=d["role"], doc_name=d["name"])
+                if changes_block:
+                    changes_blocks.append(changes_block)
+
             # Persist results for other tabs / follow-ups
             st.session_state["material_totals_by_doc"] = material_results
             totals_block = "\n\n".join(totals_blocks) if totals_blocks else ""
@@ -1889,6 +2013,8 @@ def estimate_explainer_tab(preferred_lang: Dict):
             # Optional: store these if you use them elsewhere
             st.session_state["room_totals_blocks"] = room_totals_blocks
             st.session_state["key_numbers_blocks"] = key_numbers_blocks
+            st.session_state["column_totals_blocks"] = column_totals_blocks
+            st.session_state["estimate_changes_blocks"] = changes_blocks
 
 
             # Build user content with extracted text
@@ -1951,6 +2077,34 @@ CRITICAL RULE:
 - Only mention key numbers that appear in this block.
 """
 
+            #---- COLUMN TOTALS BY CATEGORY ----------------
+            column_totals_block_all = "\n\n".join(column_totals_blocks).strip()
+
+            if column_totals_block_all:
+                user_content += f"""
+
+{column_totals_block_all}
+
+CRITICAL RULE:
+- These are the estimate's RCV, tax, O&P, depreciation and ACV columns summed per category, line by line.
+- Use them when explaining how much of each category was depreciated or what is paid now (ACV) versus later.
+- Do NOT recompute, modify, or infer any of these amounts.
+"""
+
+            #---- CHANGES SINCE PREVIOUS UPLOAD ----------------
+            changes_block_all = "\n\n".join(changes_blocks).strip()
+
+            if changes_block_all:
+                user_content += f"""
+
+{changes_block_all}
+
+CRITICAL RULE:
+- This is a revised version of an estimate the user uploaded earlier; these differences were computed line by line.
+- Add a short "What Changed" section that explains the largest changes in plain language.
+- Do NOT recompute, modify, or infer any of these amounts.
+"""
+
 
             # st.text_area(
             #     "DEBUG: per-document material totals (structured)",
@@ -1978,34 +2132,37 @@ CRITICAL RULE:
             # Call GPT with text (not PDF)
             set_step(3, "Putting together your explanation…")
 
+            # English streams here; Spanish sections render below as they are translated
+            explanation_slot = st.empty()
+            translation_slot = st.empty()
+
             t0 = time.perf_counter()  # time debug
             system_prompt = build_estimate_system_prompt()
-            english_answer = call_gpt(
-                system_prompt=system_prompt,
-                user_content=user_content,
-                model = EXPLAIN_MODEL,
+
+            # Streams the explanation; for Spanish, each finished section is
+            # translated while the rest is still generating. Dash normalization
+            # and markdown sanitizing are applied inside.
+            english_answer, translated_answer = explain_with_overlapped_translation(
+                system_prompt,
+                user_content,
+                preferred_lang["code"],
+                model=EXPLAIN_MODEL,
                 temperature=0.4,
                 max_output_tokens=1100,
+                translation_placeholder=translation_slot,
+                english_placeholder=explanation_slot,
             )
 
             t1 = time.perf_counter()  # time debug
             explain_time = t1 - t0    # time debug
-
-            # Normalize unicode dashes
-            english_answer = english_answer.replace("–", "-").replace("—", "-")
-
-            # Sanitize markdown for Streamlit rendering
-            english_answer = sanitize_for_streamlit_markdown(english_answer)
-
-
-            translated_answer = translate_if_needed(
-                english_answer, preferred_lang["code"]
-            )
+            print(f"[TIMING] explanation + translation: {explain_time:.2f}s")
 
             set_step(4, "Done.")
             time.sleep(0.2)  # optional: lets users see “Done.” briefly
             progress_bar.empty()
             status_box.empty()
+            explanation_slot.empty()  # final explanation + translation render below
+            translation_slot.empty()
 
 
             # Store explanation for follow-ups
@@ -2195,6 +2352,28 @@ CRITICAL RULE:
                 insurance_pdf_data = st.session_state.get("estimate_insurance_pdfs", [])
                 contractor_pdf_data = st.session_state.get("estimate_contractor_pdfs", [])
 
+                # Reuse the already-redacted text from the first run
+                extracted_docs = st.session_state.get("estimate_extracted_docs") or []
+                missing_docs = []
+
+                if not extracted_docs:
+                    # Fallback: rebuild from the shared extraction cache by content hash.
+                    # Raw PDF bytes aren't kept, so an evicted entry can't be re-extracted here.
+                    from estimate_extract import PDF_EXTRACT_MODE, join_page_packets
+                    from extract_cache import load_redacted_pages
+
+                    for role, pdf_list in (("insurance", insurance_pdf_data), ("contractor", contractor_pdf_data)):
+                        for pdf_data in pdf_list:
+                            packets = load_redacted_pages(pdf_data.get("sha256", ""), PDF_EXTRACT_MODE)
+                            if packets is None:
+                                print(f"[CACHE] follow-up: no cached text for {pdf_data['name']}")
+                                missing_docs.append(pdf_data["name"])
+                                continue
+                            extracted_docs.append(
+                                {"role": role, "name": pdf_data["name"], "text": join_page_packets(packets)}
+                            )
+                    print(f"[CACHE] follow-up: rebuilt {len(extracted_docs)} doc(s) from extraction cache")
+
                 if not prev_expl.strip():
                     st.warning("Please run **Explain my estimate** first.")
                 elif not insurance_pdf_data and not contractor_pdf_data:
@@ -2202,6 +2381,13 @@ CRITICAL RULE:
                         "Your uploaded estimate PDFs aren't available anymore. "
                         "Please re-upload and run **Explain my estimate** again."
                     )
+                elif missing_docs or not extracted_docs:
+                    # Don't let the model answer without the estimate text
+                    st.warning(
+                        "The text of your estimate is no longer available"
+                        + (f" ({', '.join(missing_docs)})" if missing_docs else "")
+                        + ". Please re-upload and run **Explain my estimate** again."
+                    )
                 else:
                     log_event("ai_request", {"helper": ESTIMATE_EXPLAINER, "action": "followup"})
                     with st.spinner("Generating follow-up explanation..."):
@@ -2232,23 +2418,10 @@ ORIGINAL NOTES FROM USER:
 {extra_prev or 'None provided'}
 """.strip()
 
-                        # Re-extract text for follow-up
-                        from estimate_extract import extract_pdf_pages_text, join_page_packets, redact_estimate_text
-
                         all_text = ""
-                        for pdf_data in insurance_pdf_data:
-                            packets = extract_pdf_pages_text(pdf_data["bytes"])
-                            block = join_page_packets(packets)
-                            block = redact_estimate_text(block)
-                            all_text += f"\n\n=== INSURANCE: {pdf_data['name']} ===\n\n"
-                            all_text += block
-
-                        for pdf_data in contractor_pdf_data:
-                            packets = extract_pdf_pages_text(pdf_data["bytes"])
-                            block = join_page_packets(packets)
-                            block = redact_estimate_text(block)
-                            all_text += f"\n\n=== CONTRACTOR: {pdf_data['name']} ===\n\n"
-                            all_text += block
+                        for d in extracted_docs:
+                            all_text += f"\n\n=== {d['role'].upper()}: {d['name']} ===\n\n"
+                            all_text += d["text"]
                         
                         follow_user_content = f"""
 {follow_notes}
@@ -2270,13 +2443,17 @@ CRITICAL RULE:
 """
 
                         
-                        follow_en = call_gpt(
+                        follow_slot = st.empty()
+                        follow_en = call_gpt_streaming(
                             system_prompt=follow_system,
                             user_content=follow_user_content,
+                            placeholder=follow_slot,
                             model=EXPLAIN_MODEL,
                             temperature=0.3,
                             max_output_tokens=700,
+                            label="estimate follow-up",
                         )
+                        follow_slot.empty()
 
                         # Normalize dashes
                         follow_en = follow_en.replace("–", "-").replace("—", "-")
@@ -2487,22 +2664,6 @@ def renovation_plan_tab(preferred_lang: Dict):
         with st.spinner("Putting together a typical sequence..."):
 
             estimate_docs = st.session_state.get("estimate_extracted_docs", [])
-            estimate_text_block = ""
-
-            if estimate_docs:
-                estimate_text_block = (
-                    "\n\nESTIMATE EXCERPT (FOR CONTEXT ONLY — DO NOT EXPAND SCOPE):\n"
-                    + "\n\n".join(
-                        [f"=== {d['role'].upper()} — {d['name']} ===\n{d['text']}" for d in estimate_docs]
-                    )
-                )
-
-            MAX_ESTIMATE_CHARS = 4000
-            if len(estimate_text_block) > MAX_ESTIMATE_CHARS:
-                estimate_text_block = (
-                    estimate_text_block[:MAX_ESTIMATE_CHARS]
-                    + "\n\n[...estimate excerpt truncated...]\n"
-                )
 
             # Deterministic keyword set from user selections
             room_terms = [r.strip().lower() for r in (rooms or []) if r and r.strip()]
@@ -2517,39 +2678,16 @@ def renovation_plan_tab(preferred_lang: Dict):
             expanded = expand_work_terms(work_terms)
             work_terms = list(dict.fromkeys(expanded))  # preserves order, removes dups
 
-            # Filter lines that mention ANY room term OR ANY work term (broad on purpose for now)
-            filtered_chunks = []
-            for d in estimate_docs:
-                text = d.get("text", "") or ""
-                lines = text.splitlines()
-
-                kept = []
-                for line in lines:
-                    l = line.lower()
-                    if any(rt in l for rt in room_terms) or any(wt in l for wt in work_terms):
-                        kept.append(line)
-
-                if kept:
-                    filtered_chunks.append(
-                        f"=== {d['role'].upper()} — {d['name']} (FILTERED) ===\n" + "\n".join(kept)
-                    )
-
-            if filtered_chunks:
-                estimate_text_block = (
-                    "\n\nESTIMATE EXCERPT (FILTERED BY YOUR SELECTED ROOMS/WORK — CONTEXT ONLY):\n"
-                    + "\n\n".join(filtered_chunks)
-                )
-
-            # Hard cap after filtering
-            MAX_ESTIMATE_CHARS = 4000
-            if len(estimate_text_block) > MAX_ESTIMATE_CHARS:
-                estimate_text_block = (
-                    estimate_text_block[:MAX_ESTIMATE_CHARS]
-                    + "\n\n[...filtered estimate excerpt truncated...]\n"
-                )
+            # Lines that mention ANY room term OR ANY work term (broad on purpose), ranked by
+            # matched terms, dollar amount and room coverage, packed into a token budget.
+            # Falls back to money-ranked lines from the whole estimate if nothing matches.
+            keyword_index = KeywordIndex({"room": room_terms, "work": work_terms})
+            estimate_text_block, excerpt_stats = build_estimate_excerpt(estimate_docs, keyword_index)
 
             print(
                 f"[RENOVATION FILTER] rooms={room_terms} work={work_terms} | "
+                f"candidate_lines={excerpt_stats['candidates']} selected={excerpt_stats['selected']} "
+                f"~tokens={excerpt_stats['tokens']} | "
                 f"estimate_text_chars={len(estimate_text_block)}"
             )
 
@@ -2585,7 +2723,12 @@ EXTRA NOTES:
             # -----end USER CONTENT-------#
 
             system_prompt = build_renovation_system_prompt()
-            english_answer = call_gpt(system_prompt, user_content, model=EXPLAIN_MODEL, temperature=0.4, max_output_tokens=700)
+            stream_slot = st.empty()
+            english_answer = call_gpt_streaming(
+                system_prompt, user_content, stream_slot,
+                model=EXPLAIN_MODEL, temperature=0.4, max_output_tokens=700, label="renovation plan",
+            )
+            stream_slot.empty()
             translated_answer = translate_if_needed(english_answer, preferred_lang["code"])
 
             # NEW: Store for follow-ups
@@ -2755,7 +2898,12 @@ USER'S FOLLOW-UP QUESTION:
 {follow_q_reno}
 """.strip()
 
-                        follow_en = call_gpt(follow_system, follow_notes, model=EXPLAIN_MODEL, temperature=0.3, max_output_tokens=600)
+                        follow_slot = st.empty()
+                        follow_en = call_gpt_streaming(
+                            follow_system, follow_notes, follow_slot,
+                            model=EXPLAIN_MODEL, temperature=0.3, max_output_tokens=600, label="renovation follow-up",
+                        )
+                        follow_slot.empty()
                         follow_es = translate_if_needed(follow_en, preferred_lang["code"])
 
                     # Storage code - OUTSIDE spinner
@@ -3032,7 +3180,12 @@ PHOTOS UPLOADED (names only; AI does not see the images in this version):
 """.strip()
 
             system_prompt = build_design_system_prompt()
-            english_answer = call_gpt(system_prompt, user_content, model=EXPLAIN_MODEL, temperature=0.4, max_output_tokens=700)
+            stream_slot = st.empty()
+            english_answer = call_gpt_streaming(
+                system_prompt, user_content, stream_slot,
+                model=EXPLAIN_MODEL, temperature=0.4, max_output_tokens=700, label="design helper",
+            )
+            stream_slot.empty()
             translated_answer = translate_if_needed(english_answer, preferred_lang["code"])
 
 # NEW: Store for follow-ups
@@ -3196,7 +3349,12 @@ USER'S FOLLOW-UP QUESTION:
 {follow_q_design}
 """.strip()
 
-                        follow_en = call_gpt(follow_system, follow_notes, model=EXPLAIN_MODEL, temperature=0.3,max_output_tokens=600)
+                        follow_slot = st.empty()
+                        follow_en = call_gpt_streaming(
+                            follow_system, follow_notes, follow_slot,
+                            model=EXPLAIN_MODEL, temperature=0.3, max_output_tokens=600, label="design follow-up",
+                        )
+                        follow_slot.empty()
                         follow_es = translate_if_needed(follow_en, preferred_lang["code"])
 
                     # Storage code - OUTSIDE spinner
@@ -3414,6 +3572,8 @@ def main():
 
         # --- Spinner placeholder (above Start over) ---
         spinner_slot = st.empty()
+        # English answers stream here before the chat box re-renders
+        stream_slot = st.empty()
 
         # --- Clear chat button (ONLY after chat has started) ---
         if st.session_state.home_messages:
@@ -3452,12 +3612,15 @@ def main():
         Now respond as the Home assistant. Remember: suggest ONE best starting tool.
         """.strip()
 
-                    assistant_en = call_gpt(
+                    assistant_en = call_gpt_streaming(
                         system_prompt=system_prompt,
                         user_content=user_content,
+                        # Spanish users see the translation, so only stream English
+                        placeholder=stream_slot if preferred_lang["code"] == "en" else None,
                         model=BUCKET_MODEL,          # cheap + fast is fine for orientation
                         temperature=0.4,
                         max_output_tokens=320,
+                        label="home chat",
                     ).strip()
 
                     assistant_text = assistant_en
@@ -3477,6 +3640,7 @@ def main():
                     assistant_text = "\n\n".join(lines)
 
             spinner_slot.empty()  # optional: collapses slot immediately (before rerun)
+            stream_slot.empty()
 
             st.session_state.home_messages.append({"role": "assistant", "content": assistant_text})
             log_event("ai_success", {"helper": INTRO_CHATBOT, "model": BUCKET_MODEL})
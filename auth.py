@@ -1,35 +1,40 @@
 import os
 import secrets
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta, timezone
 
-import psycopg
 from fastapi import FastAPI
 from fastapi.responses import HTMLResponse, RedirectResponse
 from starlette.requests import Request
 
 from access_codes import compute_hmac, normalize_access_code
+from db import async_connection, get_async_pool, close_async_pool
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open the async pool before the first login instead of during it.
+    # If config is missing, keep serving; get_async_pool() retries on use.
+    try:
+        await get_async_pool()
+    except Exception as e:
+        print(f"Auth DB pool not opened at startup: {e}")
+    yield
+    await close_async_pool()
+
+
+app = FastAPI(lifespan=lifespan)
 
 COOKIE_NAME = os.getenv("SESSION_COOKIE_NAME", "ns_session")
 SESSION_DAYS = int(os.getenv("SESSION_DAYS", "30"))
 
 
 def _db_conn():
-    dsn = os.getenv("DATABASE_URL")
-    if dsn:
-        return psycopg.connect(dsn, autocommit=True)
-    return psycopg.connect(
-        host=os.getenv("DB_HOST", "cloudsql-proxy"),
-        port=int(os.getenv("DB_PORT", "5432")),
-        dbname=os.getenv("DB_NAME", "contractor_prod"),
-        user=os.getenv("DB_USER", "contractor_app"),
-        password=os.getenv("DB_PASSWORD"),
-        autocommit=True,
-    )
+    # Async pooled connection (db.get_async_pool); use with `async with`
+    return async_connection()
 
 
-def _create_session(contractor_id: int) -> tuple[str, datetime]:
+async def _create_session(contractor_id: int) -> tuple[str, datetime]:
     token = secrets.token_urlsafe(32)
     expires_at = datetime.now(timezone.utc) + timedelta(days=SESSION_DAYS)
     q = """
@@ -38,10 +43,10 @@ def _create_session(contractor_id: int) -> tuple[str, datetime]:
         VALUES (%s, %s, %s, NULL, NULL)
         RETURNING id
     """
-    with _db_conn() as conn:
-        with conn.cursor() as cur:
-            cur.execute(q, (contractor_id, expires_at, token))
-            cur.fetchone()
+    async with _db_conn() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(q, (contractor_id, expires_at, token))
+            await cur.fetchone()
     return token, expires_at
 
 
@@ -103,10 +108,10 @@ async def do_login(request: Request):
         WHERE access_code_hmac = %s
         LIMIT 1
     """
-    with _db_conn() as conn:
-        with conn.cursor() as cur:
-            cur.execute(q, (h,))
-            row = cur.fetchone()
+    async with _db_conn() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(q, (h,))
+            row = await cur.fetchone()
 
     if not row:
         return RedirectResponse("/auth/login?error=Invalid+access+code", status_code=303)
@@ -122,7 +127,7 @@ async def do_login(request: Request):
     else:
         return RedirectResponse("/auth/login?error=Access+code+not+active", status_code=303)
 
-    session_token, expires_at = _create_session(int(contractor_id))
+    session_token, expires_at = await _create_session(int(contractor_id))
 
     response = RedirectResponse("/", status_code=303)
     response.set_cookie(
@@ -138,7 +143,18 @@ async def do_login(request: Request):
 
 
 @app.post("/auth/logout")
-async def logout():
+async def logout(request: Request):
+    # Revoke server-side too: Streamlit's session cache (session_cache.py)
+    # stops honoring the token once its TTL lapses.
+    token = request.cookies.get(COOKIE_NAME)
+    if token:
+        async with _db_conn() as conn:
+            await conn.execute(
+                "UPDATE public.client_sessions SET revoked_at = now() "
+                "WHERE session_token = %s AND revoked_at IS NULL",
+                (token,),
+            )
+
     response = RedirectResponse("/auth/login", status_code=303)
     response.delete_cookie(COOKIE_NAME)
     return response
\ No newline at end of file
@@ -0,0 +1,94 @@
+# auth_loadtest.py
+"""
+Measure login throughput of the auth service (auth.py).
+
+    uvicorn auth:app --port 8502 &
+    python auth_loadtest.py --url http://localhost:8502 --code ABCD-2345 \\
+        --requests 2000 --concurrency 50
+
+Posts the login form concurrently, without following the redirect, and
+reports requests/second plus latency percentiles. A 303 to "/" counts as a
+successful login; any other response counts as an error.
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+_opener = urllib.request.build_opener(_NoRedirect)
+
+
+def _login_once(url: str, body: bytes) -> Tuple[float, bool]:
+    req = urllib.request.Request(
+        url,
+        data=body,
+        method="POST",
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+    )
+    t0 = time.perf_counter()
+    try:
+        with _opener.open(req, timeout=30) as resp:
+            status, location = resp.status, resp.headers.get("Location", "")
+    except urllib.error.HTTPError as e:
+        # Un-followed redirects surface here
+        status, location = e.code, e.headers.get("Location", "")
+    except OSError:
+        return time.perf_counter() - t0, False
+    elapsed = time.perf_counter() - t0
+
+    return elapsed, status == 303 and location == "/"
+
+
+def _pct(sorted_vals: List[float], p: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    i = min(len(sorted_vals) - 1, int(round(p / 100 * (len(sorted_vals) - 1))))
+    return sorted_vals[i]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Login throughput test for the auth service")
+    ap.add_argument("--url", default="http://localhost:8502", help="auth service base URL")
+    ap.add_argument("--code", required=True, help="a valid access code")
+    ap.add_argument("--requests", type=int, default=1000)
+    ap.add_argument("--concurrency", type=int, default=50)
+    args = ap.parse_args()
+
+    login_url = args.url.rstrip("/") + "/auth/login"
+    body = urllib.parse.urlencode({"code": args.code}).encode("utf-8")
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(lambda _: _login_once(login_url, body), range(args.requests)))
+    wall = time.perf_counter() - t0
+
+    latencies = sorted(lat for lat, _ok in results)
+    ok = sum(1 for _lat, good in results if good)
+
+    print(f"requests:    {len(results)} ({ok} ok, {len(results) - ok} errors)")
+    print(f"concurrency: {args.concurrency}")
+    print(f"wall time:   {wall:.2f}s")
+    print(f"throughput:  {len(results) / wall:.1f} logins/s")
+    print(
+        "latency ms:  "
+        f"mean={statistics.mean(latencies) * 1000:.1f} "
+        f"p50={_pct(latencies, 50) * 1000:.1f} "
+        f"p95={_pct(latencies, 95) * 1000:.1f} "
+        f"p99={_pct(latencies, 99) * 1000:.1f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+# bench_key_numbers.py
+"""
+Micro-benchmark: key-number extraction, previous per-pattern loop vs the
+combined token regex in estimate_scan.
+
+    python bench_key_numbers.py [--lines 5000] [--repeat 5] [--seed 7]
+
+Builds a synthetic Xactimate-style estimate (line items, room totals, page
+headers and summary lines with mixed/ambiguous labels), checks that both
+implementations return identical output line by line and overall, then
+reports the best-of-N time for each.
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import re
+import time
+from typing import Dict, List, Optional
+
+from estimate_scan import extract_key_numbers_from_text, key_number_for_line
+
+# ==========================================
+# LEGACY (verbatim copy of the pre-scanner implementation)
+# ==========================================
+
+_LEGACY_MONEY_RE = re.compile(r"\$?\s*(\d{1,3}(?:,\d{3})*(?:\.\d{2})|\d+(?:\.\d{2}))")
+
+_LEGACY_PATTERNS = [
+    (re.compile(r"\b(replacement cost value|rcv)\b", re.I), "Replacement Cost Value (RCV)"),
+    (re.compile(r"\b(actual cash value|acv)\b", re.I), "Actual Cash Value (ACV)"),
+    (re.compile(r"\bdepreciation\b", re.I), "Depreciation"),
+    (re.compile(r"\bdeductible\b", re.I), "Deductible"),
+    (re.compile(r"\bnet\b.*\bclaim\b", re.I), "Net Claim"),
+    (re.compile(r"\bnet\b.*\b(payment|paid|check|disbursement)\b", re.I), "Net Payment"),
+    (re.compile(r"\b(overhead\s*&\s*profit|overhead\s+and\s+profit|\bo\s*&\s*p\b)\b", re.I), "Overhead & Profit"),
+    (re.compile(r"\bsales\s*tax\b", re.I), "Sales Tax"),
+]
+
+_LEGACY_SKIP_RE = re.compile(
+    r"\b(page|subtotal by room|totals:|line item totals|labor minimums applied|recap of taxes)\b",
+    re.I,
+)
+
+
+def legacy_line(line: str) -> Optional[tuple]:
+    if not any(ch.isdigit() for ch in line):
+        return None
+    if _LEGACY_SKIP_RE.search(line):
+        return None
+    m = _LEGACY_MONEY_RE.search(line)
+    if not m:
+        return None
+    for rx, label in _LEGACY_PATTERNS:
+        if rx.search(line):
+            return label, f"${m.group(1)}"
+    return None
+
+
+def legacy_extract(text: str) -> Dict[str, str]:
+    out: Dict[str, str] = {}
+    for line in [ln.strip() for ln in text.splitlines() if ln.strip()]:
+        hit = legacy_line(line)
+        if hit:
+            out[hit[0]] = hit[1]
+    return out
+
+
+# ==========================================
+# SYNTHETIC ESTIMATE
+# ==========================================
+
+_ITEMS = [
+    "R&R Carpet pad", "Tear out wet drywall, cleanup, bag for disposal",
+    "Baseboard - 3 1/4\"", "Paint the walls and ceiling - two coats",
+    "Air mover (per 24 hour period) - No monitoring", "R&R Vanity top - cultured marble",
+    "Detach & Reset Toilet", "Seal/prime then paint the surface area (2 coats)",
+]
+_ROOMS = ["Kitchen", "Living Room", "Bathroom", "Bedroom 2", "Laundry", "Hallway"]
+_SUMMARY = [
+    "Replacement Cost Value {a}", "Less Depreciation ({a})", "Actual Cash Value {a}",
+    "Less Deductible ({a})", "Net Claim {a}", "Net Claim if Depreciation is Recovered {a}",
+    "Total Recoverable Depreciation {a}", "Overhead & Profit {a}", "O & P {a}",
+    "Overhead and Profit on line items {a}", "Sales Tax {a}", "Material Sales Tax {a}",
+    "Net payment to insured {a}", "Net check amount {a} claim", "Net deductible paid {a}",
+    "RCV {a} ACV {a}", "Payment net of prior {a}", "Net {a}", "Claim net {a}",
+    "Page: 3 of 12 RCV {a}", "Totals:Kitchen RCV {a}", "Line Item Totals: RCV {a}",
+    "Recap of Taxes, Overhead and Profit {a}", "Subtotal by room depreciation {a}",
+    "O&P only {a}", "Sales  tax and deductible {a}", "net-claim {a}", "netclaim {a}",
+]
+
+
+def _amount(rng: random.Random) -> str:
+    v = rng.uniform(1, 250000)
+    return rng.choice(["${:,.2f}", "{:,.2f}", "$ {:,.2f}", "{:.2f}"]).format(v)
+
+
+def synthetic_estimate(n_lines: int, seed: int = 7) -> str:
+    rng = random.Random(seed)
+    out: List[str] = []
+    item_no = 1
+    while len(out) < n_lines:
+        r = rng.random()
+        if r < 0.04:
+            out.append(f"--- PAGE {len(out) // 50 + 1} ---")
+            out.append("DESCRIPTION QUANTITY UNIT PRICE TAX O&P RCV DEPREC. ACV")
+        elif r < 0.08:
+            out.append(f"Totals: {rng.choice(_ROOMS)} {_amount(rng)} {_amount(rng)}")
+        elif r < 0.16:
+            out.append(rng.choice(_SUMMARY).format(a=_amount(rng)))
+        elif r < 0.20:
+            out.append(f"{rng.choice(_ROOMS)} Height: 8'")
+        else:
+            out.append(
+                f"{item_no}. {rng.choice(_ITEMS)} {rng.randint(1, 400)}.00 SF "
+                f"{rng.uniform(0.5, 12):.2f} {rng.uniform(0, 90):.2f} {rng.uniform(0, 150):.2f} "
+                f"{rng.uniform(10, 3000):,.2f} ({rng.uniform(1, 400):,.2f}) {rng.uniform(10, 2500):,.2f}"
+            )
+            item_no += 1
+    return "\n".join(out[:n_lines])
+
+
+# ==========================================
+# MAIN
+# ==========================================
+
+def _best_of(fn, text: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(text)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Key-number extraction micro-benchmark")
+    ap.add_argument("--lines", type=int, default=5000)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    text = synthetic_estimate(args.lines, args.seed)
+
+    # Identical output, per line and overall
+    for line in (ln.strip() for ln in text.splitlines()):
+        if not line:
+            continue
+        new = key_number_for_line(line)
+        assert new == legacy_line(line), (line, new, legacy_line(line))
+    legacy_out = legacy_extract(text)
+    assert extract_key_numbers_from_text(text) == legacy_out
+
+    t_legacy = _best_of(legacy_extract, text, args.repeat)
+    t_new = _best_of(extract_key_numbers_from_text, text, args.repeat)
+
+    print(f"lines:    {args.lines}")
+    print(f"labels:   {legacy_out}")
+    print(f"legacy:   {t_legacy * 1000:.1f} ms")
+    print(f"combined: {t_new * 1000:.1f} ms")
+    print(f"speedup:  {t_legacy / t_new:.2f}x (identical output)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+# bucket_cache.py
+from __future__ import annotations
+
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator
+
+from buckets import BUCKET_SET
+from money_lines import CONDITION_WORDS
+
+# ==========================================
+# CONFIG
+# ==========================================
+# Maps normalized line text -> bucket, per bucketing model. SQLite so every
+# Streamlit session and process on the host shares one cache file.
+
+BUCKET_CACHE_PATH = os.getenv(
+    "BUCKET_CACHE_PATH",
+    os.path.join(tempfile.gettempdir(), "bucket_cache.sqlite3"),
+)
+
+# Bump when the bucketing prompt or BUCKETS change so old answers stop matching
+BUCKET_CACHE_VERSION = 1
+
+_SQLITE_MAX_PARAMS = 500
+
+
+# ==========================================
+# LINE NORMALIZATION
+# ==========================================
+# "27. R&R Carpet pad 250.00 SF 0.65 12.50 32.50 207.50 (45.00) 162.50"
+#   -> "r&r carpet pad"
+
+_ITEM_NO_RE = re.compile(r"^\s*\d+\.\s+")
+
+# Money / quantity columns, optionally followed by a unit, plus
+# Xactimate age/life and depreciation % columns
+_NUMERIC_COL_RE = re.compile(
+    r"""
+    [(<\-]?\$?\d[\d,]*\.\d{2}[)>]?%?             # 1,234.56  (45.00)  <45.00>  12.50%
+    (?:\s+(?:sf|lf|sy|sq|ea|hr|cf|cy|mo|dy|wk|gal|ft|yd)\b)?
+    | \d+/\d+\s*yrs\b                            # 10/20 yrs
+    | \b\d+(?:\.\d+)?%                           # 50%
+    """,
+    re.IGNORECASE | re.VERBOSE,
+)
+
+_TRAILING_CONDITION_RE = re.compile(r"(?:\s+(?:" + "|".join(CONDITION_WORDS) + r")\.?)+\s*$")
+
+_WS_RE = re.compile(r"\s+")
+
+
+def normalize_line_text(text: str) -> str:
+    """Line text with item number, quantities, prices and depreciation columns stripped."""
+    s = _ITEM_NO_RE.sub("", text or "")
+    s = _NUMERIC_COL_RE.sub(" ", s)
+    s = _WS_RE.sub(" ", s).strip().lower()
+    s = _TRAILING_CONDITION_RE.sub("", s)
+    return s.strip(" -:;,")
+
+
+# ==========================================
+# HIT / MISS COUNTERS (process-wide)
+# ==========================================
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "stores": 0}
+
+
+def cache_stats() -> Dict[str, int]:
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _bump(key: str, n: int) -> None:
+    with _stats_lock:
+        _stats[key] += n
+
+
+# ==========================================
+# STORAGE
+# ==========================================
+
+_schema_lock = threading.Lock()
+_schema_ready = False
+
+
+def _connect() -> sqlite3.Connection:
+    global _schema_ready
+
+    conn = sqlite3.connect(BUCKET_CACHE_PATH, timeout=5.0)
+    if not _schema_ready:
+        with _schema_lock:
+            if not _schema_ready:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS bucket_cache (
+                        version    INTEGER NOT NULL,
+                        model      TEXT    NOT NULL,
+                        line_key   TEXT    NOT NULL,
+                        bucket     TEXT    NOT NULL,
+                        updated_at REAL    NOT NULL,
+                        PRIMARY KEY (version, model, line_key)
+                    )
+                    """
+                )
+                conn.commit()
+                _schema_ready = True
+    return conn
+
+
+@contextmanager
+def _cache_db() -> Iterator[sqlite3.Connection]:
+    """Short-lived connection: commit on success, always close."""
+    conn = _connect()
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def lookup_buckets(keys: Iterable[str], *, model: str) -> Dict[str, str]:
+    """
+    Return {line_key: bucket} for keys already classified by this model.
+    Counts one hit or miss per distinct key.
+    """
+    wanted = sorted({k for k in keys if k})
+    if not wanted:
+        return {}
+
+    found: Dict[str, str] = {}
+    try:
+        with _cache_db() as conn:
+            for i in range(0, len(wanted), _SQLITE_MAX_PARAMS):
+                chunk = wanted[i:i + _SQLITE_MAX_PARAMS]
+                rows = conn.execute(
+                    "SELECT line_key, bucket FROM bucket_cache "
+                    "WHERE version = ? AND model = ? "
+                    f"AND line_key IN ({','.join('?' * len(chunk))})",
+                    (BUCKET_CACHE_VERSION, model, *chunk),
+                ).fetchall()
+                for line_key, bucket in rows:
+                    if bucket in BUCKET_SET:
+                        found[line_key] = bucket
+    except sqlite3.Error as e:
+        print(f"[CACHE] bucket cache read failed: {e}")
+        found = {}
+
+    _bump("hits", len(found))
+    _bump("misses", len(wanted) - len(found))
+    return found
+
+
+def store_buckets(assignments: Dict[str, str], *, model: str) -> None:
+    """Persist {line_key: bucket} answers from the bucketing model."""
+    rows = [
+        (BUCKET_CACHE_VERSION, model, k, b, time.time())
+        for k, b in assignments.items()
+        if k and b in BUCKET_SET
+    ]
+    if not rows:
+        return
+
+    try:
+        with _cache_db() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO bucket_cache "
+                "(version, model, line_key, bucket, updated_at) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+    except sqlite3.Error as e:
+        print(f"[CACHE] bucket cache write failed: {e}")
+        return
+
+    _bump("stores", len(rows))
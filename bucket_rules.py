@@ -0,0 +1,121 @@
+# bucket_rules.py
+from __future__ import annotations
+
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from buckets import BUCKETS, BUCKET_SET
+from money_lines import MoneyLine
+from bucket_cache import normalize_line_text
+
+# ==========================================
+# RULE TABLE
+# ==========================================
+# Each layer maps bucket -> (include pattern, exclude pattern or None).
+# A layer resolves a line only when exactly ONE bucket in that layer matches;
+# anything matching zero or several buckets falls through to the next layer
+# and finally to the bucketing LLM.
+#
+# Rules run on normalize_line_text() output (lowercase, no qty/price columns).
+# Keep them conservative: a wrong local answer is worse than an LLM call.
+
+_RULES: List[Tuple[str, Dict[str, Tuple[str, Optional[str]]]]] = [
+    ("financial", {
+        "taxes": (r"\b(?:sales|material|labor)\s+tax\b", None),
+        "overhead_profit": (r"\boverhead\s*(?:&|and)\s*profit\b|^o\s*&\s*p$", None),
+        "insurance_financials": (r"\bdeductible\b|\bdepreciation\b|\bprior\s+payment\b", None),
+    }),
+    ("trade", {
+        "flooring_carpet": (r"\bcarpet\b", r"\bclean"),
+        "flooring_hard": (r"\b(?:hardwood|wood\s+floor(?:ing)?|laminate\s+floor(?:ing)?|vinyl\s+plank|luxury\s+vinyl|lvp)\b", None),
+        "tile": (r"\btile\b|\bgrout\b|\bcement\s+board\b|\bbacker\s*board\b", r"\broof|\bceiling\b"),
+        "drywall": (r"\bdrywall\b|\bsheetrock\b|\bgypsum\s+board\b", None),
+        "painting_interior": (r"\bpaint\b|\bseal/prime\b|\bprimer\b", r"\bexterior\b|\bsiding\b|\bfence\b|\bdeck\b|\bgutter|\bdownspout|\bshutter|\bgarage\s+door"),
+        "trim_finish": (r"\bbaseboard\b|\bquarter\s+round\b|\bshoe\s+mold|\bcrown\s+mold|\bcasing\b", None),
+        "cabinets_countertops": (r"\bcabinet|\bcountertop|\bvanity\s+top\b", None),
+        "plumbing": (r"\btoilet\b|\bfaucet\b|\bsink\b|\bwater\s+heater\b|\bp-trap\b|\bsupply\s+line\b", r"\bportable\b|\btemporary\b"),
+        "electrical": (r"\boutlet\b|\breceptacle\b|\blight\s+fixture\b|\bsmoke\s+detector\b|\bswitch\b", None),
+        "hvac": (r"\bhvac\b|\bductwork\b|\bfurnace\b|\bheat\s+register\b|\bcondenser\b", None),
+        "insulation": (r"\binsulation\b|\bbatt\b", None),
+        "appliances": (r"\brefrigerator\b|\bdishwasher\b|\bmicrowave\b|\boven\b", None),
+        "contents": (r"\bcontents?\s+manipulation\b|\bpack\s*out\b", None),
+        "exterior_roofing": (r"\bshingles?\b|\broofing\b|\bridge\s+cap\b|\bdrip\s+edge\b", None),
+        "exterior_siding": (r"\bsiding\b|\bhouse\s+wrap\b|\bsoffit\b|\bfascia\b", None),
+        "exterior_fencing": (r"\bfenc(?:e|ing)\b", r"\btemporary\b"),
+        "exterior_concrete_flatwork": (r"\bsidewalk\b|\bdriveway\b|\bconcrete\s+(?:slab|flatwork|patio)\b", None),
+        "landscaping": (r"\bsod\b|\bshrub\b|\bmulch\b|\blandscap", None),
+        "mitigation": (r"\bantimicrobial\b|\bwater\s+extraction\b|\bextract\s+water\b|\bmoisture\s+(?:meter|reading|mapping|detection)\b|\bmold\b", None),
+        "equipment_rentals": (r"\bscaffold|\bdumpster\b|\brental\b", None),
+        "temporary_services": (r"\btemporary\b|\bportable\s+toilet\b|\bboard\s*up\b|\btarp\b", None),
+    }),
+]
+
+# Demolition / cleanup wording is where demo vs mitigation vs the material
+# trade gets judgment-heavy, so the trade layer leaves these to the LLM.
+_TRADE_AMBIGUOUS_RE = re.compile(
+    r"^(?:remove|tear\s*out|demo|demolish|haul|debris|clean|detach)\b|\btear\s*out\b|\bdemolition\b"
+)
+
+
+class _Layer:
+    def __init__(self, name: str, rules: Dict[str, Tuple[str, Optional[str]]]):
+        for bucket in rules:
+            if bucket not in BUCKET_SET:
+                raise ValueError(f"bucket rule for unknown bucket: {bucket}")
+
+        self.name = name
+        # One alternation per layer; group names are bucket indexes into BUCKETS
+        self.group_bucket = {f"b{BUCKETS.index(b)}": b for b in rules}
+        self.include = re.compile(
+            "|".join(f"(?P<b{BUCKETS.index(b)}>{inc})" for b, (inc, _exc) in rules.items())
+        )
+        self.exclude = {b: re.compile(exc) for b, (_inc, exc) in rules.items() if exc}
+
+    def match(self, text: str) -> Optional[str]:
+        hits = set()
+        for m in self.include.finditer(text):
+            hits.add(self.group_bucket[m.lastgroup])
+            if len(hits) > 1:
+                return None
+
+        if len(hits) != 1:
+            return None
+
+        bucket = hits.pop()
+        exc = self.exclude.get(bucket)
+        if exc is not None and exc.search(text):
+            return None
+        return bucket
+
+
+_LAYERS = [_Layer(name, rules) for name, rules in _RULES]
+
+RULE_LAYERS = tuple(layer.name for layer in _LAYERS)
+
+
+def classify_by_rules(money_lines: List[MoneyLine]) -> Tuple[Dict[int, str], Dict[str, int]]:
+    """
+    Assign high-confidence buckets locally.
+
+    Returns ({money_line_id: bucket} for resolved lines only,
+             {layer_name: lines resolved by that layer}).
+    """
+    mapping: Dict[int, str] = {}
+    resolved = Counter({name: 0 for name in RULE_LAYERS})
+
+    for ml in money_lines:
+        text = normalize_line_text(ml.text)
+        if not text:
+            continue
+
+        for layer in _LAYERS:
+            if layer.name == "trade" and _TRADE_AMBIGUOUS_RE.search(text):
+                break
+            bucket = layer.match(text)
+            if bucket:
+                mapping[ml.id] = bucket
+                resolved[layer.name] += 1
+                break
+
+    return mapping, dict(resolved)
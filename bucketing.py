@@ -2,10 +2,21 @@
 from __future__ import annotations
 
 import json
-from typing import Dict, List, Any
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional
 
 from buckets import BUCKETS, BUCKET_SET
 from money_lines import MoneyLine
+from bucket_cache import normalize_line_text, lookup_buckets, store_buckets
+from bucket_rules import classify_by_rules
+
+# Long estimates are classified in bounded chunks, several calls at a time.
+# Smaller chunks keep each response well under the output limit, so the
+# model doesn't truncate and silently drop ids.
+BUCKET_CHUNK_SIZE = int(os.getenv("BUCKET_CHUNK_SIZE", "120"))
+BUCKET_MAX_WORKERS = int(os.getenv("BUCKET_MAX_WORKERS", "4"))
+BUCKET_CHUNK_RETRIES = int(os.getenv("BUCKET_CHUNK_RETRIES", "2"))
 
 
 def _build_bucketing_prompt(money_lines: List[MoneyLine]) -> str:
@@ -50,9 +61,10 @@ def _build_bucketing_prompt(money_lines: List[MoneyLine]) -> str:
     )
 
 
-def bucket_money_lines(client, model: str, money_lines: List[MoneyLine]) -> Dict[int, str]:
+def _classify_with_llm(client, model: str, money_lines: List[MoneyLine]) -> Dict[int, str]:
     """
-    Returns mapping: {money_line_id: bucket}
+    One bucketing LLM call. Returns only the ids the model actually assigned
+    to an allowed bucket; callers decide how to default the rest.
     """
     prompt = _build_bucketing_prompt(money_lines)
 
@@ -83,9 +95,120 @@ def bucket_money_lines(client, model: str, money_lines: List[MoneyLine]) -> Dict
         except Exception:
             continue
         if bucket not in BUCKET_SET:
-            bucket = "other"
+            continue
         mapping[_id] = bucket
 
+    return mapping
+
+
+def _classify_chunk(client, model: str, chunk: List[MoneyLine]) -> Dict[int, str]:
+    """
+    Classify one chunk, retrying on invalid JSON. Ids missing from a valid
+    response (truncated output) are re-sent on the next attempt.
+    """
+    mapping: Dict[int, str] = {}
+    pending = chunk
+
+    for attempt in range(1 + max(0, BUCKET_CHUNK_RETRIES)):
+        try:
+            mapping.update(_classify_with_llm(client, model, pending))
+        except (json.JSONDecodeError, TypeError, AttributeError) as e:
+            print(f"[BUCKETING] chunk of {len(pending)} failed to parse (attempt {attempt + 1}): {e}")
+            continue
+
+        pending = [ml for ml in pending if ml.id not in mapping]
+        if not pending:
+            break
+        print(f"[BUCKETING] chunk missing {len(pending)} id(s) (attempt {attempt + 1})")
+
+    return mapping
+
+
+def _classify_chunked(client, model: str, money_lines: List[MoneyLine]) -> Dict[int, str]:
+    """Split into BUCKET_CHUNK_SIZE batches, classify concurrently, merge into one map."""
+    size = max(1, BUCKET_CHUNK_SIZE)
+    chunks = [money_lines[i:i + size] for i in range(0, len(money_lines), size)]
+
+    if len(chunks) <= 1:
+        return _classify_chunk(client, model, money_lines)
+
+    mapping: Dict[int, str] = {}
+    workers = max(1, min(BUCKET_MAX_WORKERS, len(chunks)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for part in pool.map(lambda c: _classify_chunk(client, model, c), chunks):
+            mapping.update(part)
+
+    print(f"[BUCKETING] {len(chunks)} chunks x <= {size} lines, {workers} concurrent")
+    return mapping
+
+
+def bucket_money_lines(
+    client,
+    model: str,
+    money_lines: List[MoneyLine],
+    *,
+    use_cache: bool = True,
+    use_rules: bool = True,
+    stats: Optional[Dict[str, int]] = None,
+) -> Dict[int, str]:
+    """
+    Returns mapping: {money_line_id: bucket}
+
+    Resolution order, cheapest first:
+      1) deterministic keyword rules (bucket_rules), per rule layer
+      2) bucket cache keyed on normalized text (no item number, quantities or prices)
+      3) the bucketing LLM, once per remaining distinct key; answers go back to the cache
+
+    If `stats` is given it is filled with lines resolved per source:
+    {"rules_<layer>": n, ..., "cache": n, "llm": n, "llm_distinct": n}
+    """
+    mapping: Dict[int, str] = {}
+    rule_counts: Dict[str, int] = {}
+    if use_rules:
+        mapping, rule_counts = classify_by_rules(money_lines)
+
+    remaining = [ml for ml in money_lines if ml.id not in mapping]
+    keys = {ml.id: normalize_line_text(ml.text) for ml in remaining}
+
+    cached = lookup_buckets(keys.values(), model=model) if use_cache else {}
+    cache_resolved = 0
+    for ml in remaining:
+        if keys[ml.id] in cached:
+            mapping[ml.id] = cached[keys[ml.id]]
+            cache_resolved += 1
+
+    # One representative line per distinct unresolved key
+    representatives: Dict[str, MoneyLine] = {}
+    for ml in remaining:
+        if ml.id not in mapping:
+            representatives.setdefault(keys[ml.id] or f"#{ml.id}", ml)
+
+    llm_lines = len(remaining) - cache_resolved
+    print(
+        f"[BUCKETING] {len(money_lines)} lines: rules={rule_counts} cache={cache_resolved} "
+        f"llm={llm_lines} ({len(representatives)} distinct sent)"
+    )
+    if stats is not None:
+        stats.update({f"rules_{name}": n for name, n in rule_counts.items()})
+        stats["cache"] = cache_resolved
+        stats["llm"] = llm_lines
+        stats["llm_distinct"] = len(representatives)
+
+    if representatives:
+        assigned = _classify_chunked(client, model, list(representatives.values()))
+
+        learned: Dict[str, str] = {}
+        for key, ml in representatives.items():
+            if ml.id in assigned:
+                learned[key] = assigned[ml.id]
+
+        for ml in remaining:
+            if ml.id not in mapping:
+                mapping[ml.id] = learned.get(keys[ml.id] or f"#{ml.id}", "other")
+
+        if use_cache:
+            store_buckets({k: b for k, b in learned.items() if not k.startswith("#")}, model=model)
+
     # Ensure every money line has a bucket (default other)
     for ml in money_lines:
         mapping.setdefault(ml.id, "other")
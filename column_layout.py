@@ -0,0 +1,187 @@
+# column_layout.py
+from __future__ import annotations
+
+import bisect
+import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from line_items import HEADER_COLUMN_RE, HEADER_RE, IGNORED_COLUMNS
+from money_lines import LINE_ITEM_RE
+
+# ==========================================
+# CONFIG
+# ==========================================
+# Table-aware extraction: instead of page.extract_text(), the page's words
+# (pdfplumber extract_words, with x/y positions) are grouped into lines, and
+# numbered line items are split into cells by the x-position of the column
+# header ("DESCRIPTION QUANTITY UNIT PRICE TAX O&P RCV DEPREC. ACV"). A blank
+# Tax or O&P cell then stays blank instead of shifting every number after it.
+#
+# Column boundaries depend only on the header's position on the page, so they
+# are cached by a layout fingerprint: later pages, and later documents from
+# the same carrier template, reuse them without re-detecting.
+#
+# Each document's layout is detected once, from its first header, before its
+# pages are split across workers. Pages that don't repeat the header use that
+# document layout, so the rows don't depend on how pages were split.
+
+# Words whose tops are within this many points belong to the same line
+ROW_Y_TOLERANCE = float(os.getenv("ROW_Y_TOLERANCE", "3"))
+
+# Header x-positions are rounded to this many points for the fingerprint
+LAYOUT_FINGERPRINT_GRID = float(os.getenv("LAYOUT_FINGERPRINT_GRID", "2"))
+
+# Distinct header layouts remembered per process (least recently used dropped)
+LAYOUT_CACHE_MAX_ENTRIES = int(os.getenv("LAYOUT_CACHE_MAX_ENTRIES", "256"))
+
+QUANTITY_HEADER_RE = re.compile(r"(?<![a-z])(?:quantity|qty)(?![a-z])", re.IGNORECASE)
+
+Word = Dict[str, Any]   # pdfplumber word: {"text", "x0", "x1", "top", "bottom", ...}
+
+
+@dataclass(frozen=True)
+class ColumnLayout:
+    fields: Tuple[str, ...]      # columns left to right (line_items.AMOUNT_FIELDS / IGNORED_COLUMNS names)
+    lead_edge: float             # word centers left of this: item no / description / qty / unit
+    edges: Tuple[float, ...]     # boundaries between consecutive columns
+
+    def split_row(self, words: Sequence[Word]) -> Tuple[str, Dict[str, str]]:
+        """(lead text, {amount field: cell text}) for one line's words, by word center; ignored columns are dropped."""
+        lead: List[str] = []
+        cells: Dict[str, List[str]] = {}
+        for w in words:
+            center = (w["x0"] + w["x1"]) / 2
+            if center < self.lead_edge:
+                lead.append(w["text"])
+                continue
+            field = self.fields[bisect.bisect(self.edges, center)]
+            if field not in IGNORED_COLUMNS:
+                cells.setdefault(field, []).append(w["text"])
+        return " ".join(lead), {f: " ".join(ts) for f, ts in cells.items()}
+
+
+# fingerprint -> layout (per process; page-range workers each keep their own)
+_layout_lock = threading.Lock()
+_LAYOUT_CACHE: "OrderedDict[Tuple, ColumnLayout]" = OrderedDict()
+
+
+def group_lines(words: Sequence[Word]) -> List[List[Word]]:
+    """Words grouped into text lines (top within ROW_Y_TOLERANCE), each sorted left to right."""
+    lines: List[List[Word]] = []
+    line_top = None
+    for w in sorted(words, key=lambda w: (w["top"], w["x0"])):
+        if line_top is None or w["top"] - line_top > ROW_Y_TOLERANCE:
+            lines.append([])
+            line_top = w["top"]
+        lines[-1].append(w)
+    for line in lines:
+        line.sort(key=lambda w: w["x0"])
+    return lines
+
+
+def layout_fingerprint(header_words: Sequence[Word], page_width: float) -> Tuple:
+    grid = LAYOUT_FINGERPRINT_GRID
+    return (
+        round(page_width / grid),
+        tuple((w["text"].upper(), round(w["x0"] / grid), round(w["x1"] / grid)) for w in header_words),
+    )
+
+
+def detect_layout(header_words: Sequence[Word]) -> Optional[ColumnLayout]:
+    """Column boundaries from a header line's words, or None if it isn't a usable table header."""
+    text = " ".join(w["text"] for w in header_words)
+    if not HEADER_RE.search(text):
+        return None
+
+    # Character offset of each word in `text`, to map regex spans back to words
+    starts: List[int] = []
+    pos = 0
+    for w in header_words:
+        starts.append(pos)
+        pos += len(w["text"]) + 1
+
+    def span_center(start: int, end: int) -> float:
+        first = bisect.bisect_right(starts, start) - 1
+        last = bisect.bisect_right(starts, end - 1) - 1
+        return (header_words[first]["x0"] + header_words[last]["x1"]) / 2
+
+    qty = QUANTITY_HEADER_RE.search(text)
+    if qty is None:
+        return None
+
+    fields: List[str] = []
+    centers: List[float] = []
+    for m in HEADER_COLUMN_RE.finditer(text, qty.end()):
+        fields.append(m.lastgroup)
+        centers.append(span_center(m.start(), m.end()))
+    if "unit_price" not in fields or len(set(fields)) != len(fields):
+        return None
+
+    qty_center = span_center(qty.start(), qty.end())
+    return ColumnLayout(
+        fields=tuple(fields),
+        lead_edge=(qty_center + centers[0]) / 2,
+        edges=tuple((a + b) / 2 for a, b in zip(centers, centers[1:])),
+    )
+
+
+def cached_layout(header_words: Sequence[Word], page_width: float) -> Optional[ColumnLayout]:
+    key = layout_fingerprint(header_words, page_width)
+    with _layout_lock:
+        layout = _LAYOUT_CACHE.get(key)
+        if layout is not None:
+            _LAYOUT_CACHE.move_to_end(key)
+            return layout
+
+    layout = detect_layout(header_words)
+    if layout is not None:
+        with _layout_lock:
+            _LAYOUT_CACHE[key] = layout
+            _LAYOUT_CACHE.move_to_end(key)
+            while len(_LAYOUT_CACHE) > LAYOUT_CACHE_MAX_ENTRIES:
+                _LAYOUT_CACHE.popitem(last=False)
+    return layout
+
+
+def page_layout(words: Sequence[Word], page_width: float) -> Optional[ColumnLayout]:
+    """Layout of the first usable table header on a page, or None."""
+    for line_words in group_lines(words):
+        line_text = " ".join(w["text"] for w in line_words)
+        if not LINE_ITEM_RE.match(line_text) and HEADER_RE.search(line_text):
+            layout = cached_layout(line_words, page_width)
+            if layout is not None:
+                return layout
+    return None
+
+
+def table_page(
+    words: Sequence[Word],
+    page_width: float,
+    layout: Optional[ColumnLayout] = None,
+) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    One page of extract_words output -> (page text, rows [{"line", "lead", "cells"}]).
+
+    `line` indexes the page text's lines. `layout` (the document layout)
+    applies to rows above the page's own header, or to the whole page if it
+    doesn't repeat the header.
+    """
+    text_lines: List[str] = []
+    rows: List[Dict[str, Any]] = []
+    for line_words in group_lines(words):
+        line_text = " ".join(w["text"] for w in line_words)
+
+        if LINE_ITEM_RE.match(line_text):
+            if layout is not None:
+                lead, cells = layout.split_row(line_words)
+                rows.append({"line": len(text_lines), "lead": lead, "cells": cells})
+        elif HEADER_RE.search(line_text):
+            layout = cached_layout(line_words, page_width) or layout
+
+        text_lines.append(line_text)
+
+    return "\n".join(text_lines), rows
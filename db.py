@@ -0,0 +1,147 @@
+# db.py
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+import psycopg
+from psycopg_pool import AsyncConnectionPool, ConnectionPool
+
+# ==========================================
+# CONFIG
+# ==========================================
+# One pool per process: the sync pool backs Streamlit (app.py), the async pool
+# backs the FastAPI auth service (auth.py). Connections go through cloudsql-proxy,
+# so reusing them skips a TCP + TLS + auth handshake per query.
+
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+DB_POOL_TIMEOUT_S = float(os.getenv("DB_POOL_TIMEOUT_S", "10"))      # wait for a free connection
+DB_POOL_MAX_IDLE_S = float(os.getenv("DB_POOL_MAX_IDLE_S", "300"))   # close idle extras after this
+DB_POOL_MAX_LIFETIME_S = float(os.getenv("DB_POOL_MAX_LIFETIME_S", "1800"))
+
+
+def _conninfo() -> str:
+    """
+    Uses either DATABASE_URL or DB_* environment variables.
+    """
+    dsn = os.getenv("DATABASE_URL")
+    if dsn:
+        return dsn
+
+    password = os.getenv("DB_PASSWORD")
+    if not password:
+        raise RuntimeError("DB_PASSWORD is not set")
+
+    return psycopg.conninfo.make_conninfo(
+        host=os.getenv("DB_HOST", "cloudsql-proxy"),
+        port=int(os.getenv("DB_PORT", "5432")),
+        dbname=os.getenv("DB_NAME", "contractor_prod"),
+        user=os.getenv("DB_USER", "contractor_app"),
+        password=password,
+    )
+
+
+def _pool_kwargs(name: str) -> Dict[str, Any]:
+    return {
+        "min_size": DB_POOL_MIN_SIZE,
+        "max_size": max(DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE),
+        "timeout": DB_POOL_TIMEOUT_S,
+        "max_idle": DB_POOL_MAX_IDLE_S,
+        "max_lifetime": DB_POOL_MAX_LIFETIME_S,
+        "kwargs": {"autocommit": True},
+        "name": name,
+    }
+
+
+# ==========================================
+# SYNC POOL (Streamlit)
+# ==========================================
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Process-wide sync pool, opened on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    _conninfo(),
+                    # Health check on checkout: drops connections the proxy closed
+                    check=ConnectionPool.check_connection,
+                    open=True,
+                    **_pool_kwargs("app-sync"),
+                )
+    return _pool
+
+
+def close_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+# ==========================================
+# ASYNC POOL (FastAPI)
+# ==========================================
+
+_async_pool: Optional[AsyncConnectionPool] = None
+_async_pool_lock: Optional[asyncio.Lock] = None
+
+
+async def get_async_pool() -> AsyncConnectionPool:
+    """Process-wide async pool, opened on first use inside the running event loop."""
+    global _async_pool, _async_pool_lock
+    if _async_pool is None:
+        if _async_pool_lock is None:
+            _async_pool_lock = asyncio.Lock()
+        async with _async_pool_lock:
+            if _async_pool is None:
+                pool = AsyncConnectionPool(
+                    _conninfo(),
+                    check=AsyncConnectionPool.check_connection,
+                    open=False,
+                    **_pool_kwargs("auth-async"),
+                )
+                await pool.open()
+                _async_pool = pool
+    return _async_pool
+
+
+@asynccontextmanager
+async def async_connection() -> AsyncIterator[psycopg.AsyncConnection]:
+    pool = await get_async_pool()
+    async with pool.connection() as conn:
+        yield conn
+
+
+async def close_async_pool() -> None:
+    global _async_pool
+    if _async_pool is not None:
+        await _async_pool.close()
+        _async_pool = None
+
+
+# ==========================================
+# METRICS
+# ==========================================
+
+def pool_metrics() -> Dict[str, Dict[str, int]]:
+    """
+    psycopg_pool counters (pool_size, pool_available, requests_waiting,
+    requests_num, connections_num, ...) for whichever pools are open.
+    """
+    out: Dict[str, Dict[str, int]] = {}
+    if _pool is not None:
+        out[_pool.name] = _pool.get_stats()
+    if _async_pool is not None:
+        out[_async_pool.name] = _async_pool.get_stats()
+    return out
@@ -0,0 +1,158 @@
+# estimate_diff.py
+from __future__ import annotations
+
+import os
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Deque, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from bucket_cache import normalize_line_text
+from money_lines import MoneyLine
+
+# ==========================================
+# CONFIG
+# ==========================================
+# Adjusters often send a revised estimate that differs by a handful of line
+# items. Atomic lines of the new document are aligned with the previous run's
+# lines by normalized text (item number, quantities and prices stripped), so
+# unchanged and re-priced lines keep their bucket and only genuinely new
+# descriptions go to the bucketing rules / cache / LLM.
+
+# Below this share of matched lines the upload is treated as a different
+# estimate, not a revision (no changed-lines report)
+REVISION_MIN_OVERLAP = float(os.getenv("REVISION_MIN_OVERLAP", "0.5"))
+
+
+def _align_key(ml: MoneyLine) -> str:
+    return normalize_line_text(ml.text) or f"#{ml.text}"
+
+
+@dataclass(frozen=True)
+class LineChange:
+    kind: str                       # "added" | "removed" | "changed"
+    bucket: Optional[str]           # removed/changed: previous bucket; added: assigned after bucketing
+    old: Optional[MoneyLine]
+    new: Optional[MoneyLine]
+
+    @property
+    def delta(self) -> Decimal:
+        old_amt = self.old.amount if self.old is not None else Decimal("0.00")
+        new_amt = self.new.amount if self.new is not None else Decimal("0.00")
+        return new_amt - old_amt
+
+
+@dataclass
+class LineDiff:
+    reused: Dict[int, str] = field(default_factory=dict)     # new id -> bucket carried over
+    added: List[MoneyLine] = field(default_factory=list)     # need classification
+    removed: List[Tuple[MoneyLine, str]] = field(default_factory=list)
+    changed: List[Tuple[MoneyLine, MoneyLine, str]] = field(default_factory=list)  # (old, new, bucket)
+    unchanged: int = 0
+    previous_count: int = 0
+    new_count: int = 0
+
+    @property
+    def matched(self) -> int:
+        return self.unchanged + len(self.changed)
+
+    @property
+    def is_revision(self) -> bool:
+        denom = max(self.previous_count, self.new_count)
+        return denom > 0 and self.matched / denom >= REVISION_MIN_OVERLAP
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.added or self.removed or self.changed)
+
+    def changes(self, bucket_map: Mapping[int, str]) -> List[LineChange]:
+        """All changes; added lines take their bucket from the new run's bucket_map."""
+        out = [LineChange("changed", b, old, new) for old, new, b in self.changed]
+        out += [LineChange("added", bucket_map.get(ml.id, "other"), None, ml) for ml in self.added]
+        out += [LineChange("removed", b, ml, None) for ml, b in self.removed]
+        return out
+
+    def bucket_deltas(self, bucket_map: Mapping[int, str]) -> Dict[str, Decimal]:
+        """bucket -> net change in total vs the previous run (non-zero only)."""
+        deltas: Dict[str, Decimal] = defaultdict(lambda: Decimal("0.00"))
+        for c in self.changes(bucket_map):
+            deltas[c.bucket or "other"] += c.delta
+        return {b: d for b, d in deltas.items() if d != Decimal("0.00")}
+
+
+def diff_money_lines(
+    previous_lines: Iterable[MoneyLine],
+    previous_bucket_map: Mapping[int, str],
+    new_lines: Iterable[MoneyLine],
+) -> LineDiff:
+    """
+    Align new atomic lines with the previous run's by normalized text.
+
+    Exact (text, amount) pairs are matched first so a repeated description
+    ("R&R Toilet" in every bathroom) doesn't shift onto a neighbour when one
+    copy is added or removed; leftovers with the same text are re-priced
+    lines, paired in document order.
+    """
+    previous_lines = list(previous_lines)
+    new_lines = list(new_lines)
+    diff = LineDiff(previous_count=len(previous_lines), new_count=len(new_lines))
+
+    exact: Dict[Tuple[str, Decimal], Deque[MoneyLine]] = defaultdict(deque)
+    for ml in previous_lines:
+        exact[(_align_key(ml), ml.amount)].append(ml)
+
+    consumed = set()
+    pending: List[MoneyLine] = []
+    for ml in new_lines:
+        candidates = exact.get((_align_key(ml), ml.amount))
+        if candidates:
+            old = candidates.popleft()
+            consumed.add(old.id)
+            diff.reused[ml.id] = previous_bucket_map.get(old.id, "other")
+            diff.unchanged += 1
+        else:
+            pending.append(ml)
+
+    by_text: Dict[str, Deque[MoneyLine]] = defaultdict(deque)
+    for ml in previous_lines:
+        if ml.id not in consumed:
+            by_text[_align_key(ml)].append(ml)
+
+    for ml in pending:
+        candidates = by_text.get(_align_key(ml))
+        if not candidates:
+            diff.added.append(ml)
+            continue
+        old = candidates.popleft()
+        consumed.add(old.id)
+        bucket = previous_bucket_map.get(old.id, "other")
+        diff.reused[ml.id] = bucket
+        diff.changed.append((old, ml, bucket))
+
+    diff.removed = [
+        (ml, previous_bucket_map.get(ml.id, "other")) for ml in previous_lines if ml.id not in consumed
+    ]
+    return diff
+
+
+def format_changed_lines(
+    diff: LineDiff,
+    bucket_map: Mapping[int, str],
+    *,
+    max_lines: int = 25,
+) -> List[str]:
+    """Human-readable change lines, largest absolute dollar change first."""
+    changes = sorted(diff.changes(bucket_map), key=lambda c: abs(c.delta), reverse=True)
+
+    out: List[str] = []
+    for c in changes[:max_lines]:
+        if c.kind == "changed":
+            out.append(f"CHANGED [{c.bucket}] {c.new.text} (was ${c.old.amount:,.2f}, now ${c.new.amount:,.2f})")
+        elif c.kind == "added":
+            out.append(f"ADDED [{c.bucket}] {c.new.text} (${c.new.amount:,.2f})")
+        else:
+            out.append(f"REMOVED [{c.bucket}] {c.old.text} (${c.old.amount:,.2f})")
+
+    if len(changes) > max_lines:
+        out.append(f"... and {len(changes) - max_lines} smaller changes")
+    return out
@@ -0,0 +1,193 @@
+# estimate_excerpt.py
+from __future__ import annotations
+
+import heapq
+import math
+import os
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+from estimate_scan import AtomicMoneyLines, KeywordTags, run_scan
+from keyword_index import KeywordIndex
+
+# ==========================================
+# CONFIG
+# ==========================================
+# The renovation prompt carries a slice of the uploaded estimate. Instead of
+# the first N characters, lines are ranked and packed into a token budget:
+#
+#   score = matched terms (+ bonus if a line names both a room and a work type)
+#         + dollar magnitude of the line item (log scale)
+#         + coverage bonus for rooms / work terms not yet in the excerpt
+#
+# Coverage is re-evaluated as lines are picked (lazy greedy), so one room with
+# fifty line items can't crowd out the others. Selected lines are emitted in
+# document order.
+
+ESTIMATE_EXCERPT_TOKEN_BUDGET = int(os.getenv("ESTIMATE_EXCERPT_TOKEN_BUDGET", "1000"))
+
+# Rough chars-per-token for English estimate text (no tokenizer dependency)
+CHARS_PER_TOKEN = 4
+
+TERM_WEIGHT = 1.0           # per distinct matched term
+ROOM_AND_WORK_BONUS = 1.5   # line mentions a selected room AND a selected work type
+MONEY_WEIGHT = 0.5          # per order of magnitude of the line amount ($100 -> 1.0)
+NEW_ROOM_BONUS = 3.0        # per room term not yet covered
+NEW_WORK_BONUS = 1.0        # per work term not yet covered
+
+FILTERED_HEADER = "ESTIMATE EXCERPT (FILTERED BY YOUR SELECTED ROOMS/WORK — CONTEXT ONLY):"
+UNFILTERED_HEADER = "ESTIMATE EXCERPT (FOR CONTEXT ONLY — DO NOT EXPAND SCOPE):"
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+@dataclass(frozen=True)
+class _Candidate:
+    doc_index: int
+    raw_line_no: int
+    text: str
+    rooms: FrozenSet[str]
+    work: FrozenSet[str]
+    base_score: float
+    tokens: int
+
+
+def _money_score(amount: Optional[Decimal]) -> float:
+    if amount is None:
+        return 0.0
+    return MONEY_WEIGHT * math.log10(1 + abs(float(amount)))
+
+
+def _doc_header(doc: Dict, filtered: bool) -> str:
+    suffix = " (FILTERED)" if filtered else ""
+    return f"=== {doc['role'].upper()} — {doc['name']}{suffix} ==="
+
+
+def _collect_candidates(
+    docs: Sequence[Dict],
+    index: KeywordIndex,
+) -> Tuple[List[_Candidate], bool]:
+    """Keyword-tagged lines if any doc has one, else every line (money-ranked). Returns (candidates, filtered)."""
+    scans = []
+    for d in docs:
+        scans.append(
+            run_scan(d.get("text", "") or "", [AtomicMoneyLines(), KeywordTags(index)])
+        )
+
+    filtered = any(s["keyword_tags"] for s in scans)
+    out: List[_Candidate] = []
+
+    for doc_i, (d, scan) in enumerate(zip(docs, scans)):
+        amounts = {m.raw_line_no: m.amount for m in scan["money_lines"]}
+
+        if filtered:
+            for t in scan["keyword_tags"]:
+                rooms = t.tags.get("room", frozenset())
+                work = t.tags.get("work", frozenset())
+                text = t.text.strip()
+                score = TERM_WEIGHT * t.relevance + _money_score(amounts.get(t.raw_line_no))
+                if rooms and work:
+                    score += ROOM_AND_WORK_BONUS
+                out.append(_Candidate(doc_i, t.raw_line_no, text, rooms, work, score, estimate_tokens(text)))
+        else:
+            for raw_i, raw in enumerate((d.get("text", "") or "").splitlines()):
+                text = raw.strip()
+                if not text:
+                    continue
+                out.append(
+                    _Candidate(
+                        doc_i, raw_i, text, frozenset(), frozenset(),
+                        _money_score(amounts.get(raw_i)), estimate_tokens(text),
+                    )
+                )
+
+    return out, filtered
+
+
+def _select(candidates: List[_Candidate], budget: int) -> List[_Candidate]:
+    """Lazy-greedy pick by marginal score (base + uncovered rooms/work) until the budget is spent."""
+    covered_rooms: set = set()
+    covered_work: set = set()
+
+    def marginal(c: _Candidate) -> float:
+        return (
+            c.base_score
+            + NEW_ROOM_BONUS * len(c.rooms - covered_rooms)
+            + NEW_WORK_BONUS * len(c.work - covered_work)
+        )
+
+    # (-score, position) so ties keep document order
+    heap = [(-marginal(c), i) for i, c in enumerate(candidates)]
+    heapq.heapify(heap)
+
+    picked: List[_Candidate] = []
+    remaining = budget
+    while heap and remaining > 0:
+        neg_score, i = heapq.heappop(heap)
+        c = candidates[i]
+
+        # Coverage only shrinks scores, so a stale entry is re-queued with its current value
+        current = marginal(c)
+        if current < -neg_score:
+            heapq.heappush(heap, (-current, i))
+            continue
+
+        if c.tokens > remaining:
+            continue
+
+        picked.append(c)
+        remaining -= c.tokens
+        covered_rooms |= c.rooms
+        covered_work |= c.work
+
+    return picked
+
+
+def build_estimate_excerpt(
+    docs: Sequence[Dict],
+    index: KeywordIndex,
+    *,
+    token_budget: int = ESTIMATE_EXCERPT_TOKEN_BUDGET,
+) -> Tuple[str, Dict[str, int]]:
+    """
+    docs: [{"role", "name", "text"}] (st.session_state["estimate_extracted_docs"]).
+
+    Returns (excerpt block for the prompt, stats). The block is "" when there
+    are no docs. Lines matching the index are preferred; with no matches at
+    all, every line competes on dollar magnitude.
+    """
+    stats = {"candidates": 0, "selected": 0, "tokens": 0}
+    docs = [d for d in docs if (d.get("text") or "").strip()]
+    if not docs:
+        return "", stats
+
+    candidates, filtered = _collect_candidates(docs, index)
+    header = FILTERED_HEADER if filtered else UNFILTERED_HEADER
+
+    # Headers are always sent, so they come out of the budget first
+    overhead = estimate_tokens(header) + sum(estimate_tokens(_doc_header(d, filtered)) for d in docs)
+    picked = _select(candidates, max(0, token_budget - overhead))
+
+    by_doc: Dict[int, List[_Candidate]] = {}
+    for c in picked:
+        by_doc.setdefault(c.doc_index, []).append(c)
+
+    chunks = []
+    for doc_i, d in enumerate(docs):
+        lines = sorted(by_doc.get(doc_i, []), key=lambda c: c.raw_line_no)
+        if lines:
+            chunks.append(_doc_header(d, filtered) + "\n" + "\n".join(c.text for c in lines))
+
+    stats["candidates"] = len(candidates)
+    stats["selected"] = len(picked)
+    stats["tokens"] = overhead + sum(c.tokens for c in picked)
+
+    if not chunks:
+        return "", stats
+
+    omitted = len(candidates) - len(picked)
+    note = f"\n\n[{omitted} lower-relevance estimate lines omitted]\n" if omitted else ""
+    return "\n\n" + header + "\n" + "\n\n".join(chunks) + note, stats
@@ -1,23 +1,192 @@
 # estimate_extract.py
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
 import pdfplumber
 
+from column_layout import ColumnLayout, page_layout, table_page
+from extract_cache import pdf_digest, load_redacted_pages, store_redacted_pages
+from line_items import LineItemRow, line_item_from_cells
+from money_lines import clean_line
+
 import re
 
 
-def extract_pdf_pages_text(pdf_bytes: bytes) -> List[Dict[str, Any]]:
+# ── Parallel extraction config ───────────────────────────────────────────────
+# PDF_EXTRACT_WORKERS: process count for page extraction (0 = available CPUs).
+# PDF_PARALLEL_MIN_PAGES: total pages below which we stay on the serial path,
+# since spinning up worker processes costs more than it saves on short PDFs.
+
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", "0"))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "12"))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "8"))
+
+# Worker processes are started with forkserver (spawn where it isn't available),
+# never fork: the Streamlit process runs tornado, the psycopg pools and the
+# last_seen / usage-event threads, and a forked child can inherit a lock one of
+# those threads was holding.
+PDF_EXTRACT_START_METHOD = (
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+# PDF_EXTRACT_MODE: "text" = page.extract_text(); "table" = page.extract_words()
+# grouped into lines, plus column-assigned line-item rows (see column_layout).
+PDF_EXTRACT_MODE = os.getenv("PDF_EXTRACT_MODE", "text")
+
+# PDF_LAYOUT_SCAN_PAGES: leading pages searched for the document's column
+# header in "table" mode, before pages are split across workers.
+PDF_LAYOUT_SCAN_PAGES = int(os.getenv("PDF_LAYOUT_SCAN_PAGES", "5"))
+
+
+def _resolve_workers(workers: Optional[int]) -> int:
+    n = PDF_EXTRACT_WORKERS if workers is None else workers
+    if n <= 0:
+        # Respect container CPU limits where the platform exposes them
+        n = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    return max(1, n)
+
+
+def _count_pages(pdf_bytes: bytes) -> int:
+    with pdfplumber.open(BytesIO(pdf_bytes)) as pdf:
+        return len(pdf.pages)
+
+
+def _document_layout(pdf_bytes: bytes) -> Optional[ColumnLayout]:
+    """Column layout from the first header in the document's leading pages, or None."""
+    with pdfplumber.open(BytesIO(pdf_bytes)) as pdf:
+        for page in pdf.pages[:PDF_LAYOUT_SCAN_PAGES]:
+            layout = page_layout(page.extract_words(), page.width)
+            if layout is not None:
+                return layout
+    return None
+
+
+def _extract_page_range(
+    pdf_bytes: bytes,
+    start: int,
+    end: int,
+    mode: str = "text",
+    layout: Optional[ColumnLayout] = None,
+) -> List[Dict[str, Any]]:
     """
-    Returns a list of page packets:
-      [{ "page": 1, "text": "...", "method": "pdfplumber" }, ...]
+    Extract pages [start, end) (0-based). Also runs inside worker processes
+    (via _extract_worker_range), so it opens its own pdfplumber handle.
+
+    In "table" mode packets also carry "rows": [{"line", "lead", "cells"}];
+    `layout` is the document layout (_document_layout) for pages without
+    their own header.
     """
     packets: List[Dict[str, Any]] = []
     with pdfplumber.open(BytesIO(pdf_bytes)) as pdf:
-        for i, page in enumerate(pdf.pages, start=1):
-            text = page.extract_text() or ""
-            packets.append({"page": i, "text": text, "method": "pdfplumber"})
+        for i in range(start, min(end, len(pdf.pages))):
+            page = pdf.pages[i]
+            if mode == "table":
+                text, rows = table_page(page.extract_words(), page.width, layout)
+                packets.append({"page": i + 1, "text": text, "method": "pdfplumber_words", "rows": rows})
+            else:
+                text = page.extract_text() or ""
+                packets.append({"page": i + 1, "text": text, "method": "pdfplumber"})
     return packets
 
+
+def _mp_context():
+    ctx = multiprocessing.get_context(PDF_EXTRACT_START_METHOD)
+    if PDF_EXTRACT_START_METHOD == "forkserver":
+        # The (single-threaded) fork server imports pdfplumber once; workers fork from it
+        ctx.set_forkserver_preload([__name__])
+    return ctx
+
+
+# PDF bytes for the current pool, set once per worker by _init_worker so
+# tasks only carry (document index, page range)
+_worker_pdfs: List[bytes] = []
+
+
+def _init_worker(pdfs: List[bytes]) -> None:
+    global _worker_pdfs
+    _worker_pdfs = pdfs
+
+
+def _extract_worker_range(
+    doc_i: int,
+    start: int,
+    end: int,
+    mode: str,
+    layout: Optional[ColumnLayout],
+) -> List[Dict[str, Any]]:
+    return _extract_page_range(_worker_pdfs[doc_i], start, end, mode, layout)
+
+
+def _page_ranges(page_count: int, per_task: int) -> List[Tuple[int, int]]:
+    per_task = max(1, per_task)
+    return [(s, min(s + per_task, page_count)) for s in range(0, page_count, per_task)]
+
+
+def extract_many_pdfs_pages_text(
+    pdfs: List[bytes],
+    *,
+    workers: Optional[int] = None,
+    mode: Optional[str] = None,
+) -> List[List[Dict[str, Any]]]:
+    """
+    Extract several PDFs at once. Page ranges from every file go into one
+    process pool; packets are reassembled per file in page order.
+
+    Returns one packet list per input, in input order. Falls back to the
+    serial path when the combined page count is small or only one worker
+    is available.
+    """
+    if not pdfs:
+        return []
+
+    mode = mode or PDF_EXTRACT_MODE
+    n_workers = _resolve_workers(workers)
+    page_counts = [_count_pages(b) for b in pdfs]
+    layouts = [_document_layout(b) if mode == "table" else None for b in pdfs]
+
+    if n_workers <= 1 or sum(page_counts) < PDF_PARALLEL_MIN_PAGES:
+        return [_extract_page_range(b, 0, n, mode, lay) for b, n, lay in zip(pdfs, page_counts, layouts)]
+
+    # Size tasks so every worker gets work even for a single long PDF
+    per_task = min(PDF_PAGES_PER_TASK, max(1, -(-sum(page_counts) // n_workers)))
+
+    results: List[List[Dict[str, Any]]] = [[] for _ in pdfs]
+    with ProcessPoolExecutor(
+        max_workers=n_workers,
+        mp_context=_mp_context(),
+        initializer=_init_worker,
+        initargs=(pdfs,),
+    ) as pool:
+        futures = []
+        for doc_i, (n, lay) in enumerate(zip(page_counts, layouts)):
+            for start, end in _page_ranges(n, per_task):
+                futures.append((doc_i, pool.submit(_extract_worker_range, doc_i, start, end, mode, lay)))
+
+        # Futures were submitted in (doc, page range) order, so collecting in
+        # submission order keeps pages sorted.
+        for doc_i, fut in futures:
+            results[doc_i].extend(fut.result())
+
+    return results
+
+
+def extract_pdf_pages_text(
+    pdf_bytes: bytes,
+    *,
+    workers: Optional[int] = None,
+    mode: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Returns a list of page packets:
+      [{ "page": 1, "text": "...", "method": "pdfplumber" }, ...]
+
+    Long documents are split into page ranges across a process pool
+    (see extract_many_pdfs_pages_text); short ones are read serially.
+    """
+    return extract_many_pdfs_pages_text([pdf_bytes], workers=workers, mode=mode)[0]
+
 def join_page_packets(packets: List[Dict[str, Any]]) -> str:
     """
     Makes a single string for the LLM.
@@ -28,6 +197,31 @@ def join_page_packets(packets: List[Dict[str, Any]]) -> str:
     return "\n".join(parts).strip()
 
 
+def line_items_from_packets(packets: List[Dict[str, Any]]) -> List[LineItemRow]:
+    """
+    Typed line items from "table" mode packets, with raw_line_no pointing into
+    join_page_packets(packets) (so they join to money lines like parsed rows
+    do). Empty for "text" mode packets.
+    """
+    if not any(p.get("rows") for p in packets):
+        return []
+
+    joined_lines = join_page_packets(packets).splitlines()
+    out: List[LineItemRow] = []
+    offset = 1  # each page's text follows its "--- PAGE n ---" line
+    for p in packets:
+        for r in p.get("rows", []):
+            raw_i = offset + r["line"]
+            # Skip rows whose line moved (e.g. redaction joined two lines)
+            if raw_i >= len(joined_lines) or not clean_line(joined_lines[raw_i]).startswith(clean_line(r["lead"])):
+                continue
+            row = line_item_from_cells(r["lead"], r["cells"], raw_line_no=raw_i)
+            if row is not None:
+                out.append(row)
+        offset += f"\n--- PAGE {p['page']} ---\n{p['text']}".rstrip().count("\n") + 1
+    return out
+
+
 # ── Pass A: labeled-field redaction ──────────────────────────────────────────
 
 _LABEL_RE = re.compile(
@@ -37,7 +231,7 @@ _LABEL_RE = re.compile(
         (?:
             Insured | Client | Property | Loss\s*Location |
             Claim(?:\s*Number)? | Policy(?:\s*Number)? |
-            Estimate(?:\s*(?:ID|Number|#))? |
+            Estimate(?:\s*(?:ID|Number|\#))? |
             Home | Cell(?:ular)? | Phone | Mobile |
             E[\-\s]?mail | Email |
             Adjuster | Estimator | Inspector | Operator |
@@ -92,21 +286,29 @@ def _strip_running_headers(text: str, claim_number: str) -> str:
     return pattern.sub("[HEADER REDACTED]", text)
 
 
-def redact_estimate_text(text: str) -> str:
+def _find_claim_number(text: str) -> str:
+    claim_match = re.search(
+        r"(?:Claim(?:\s*Number)?)\s*:?\s*([A-Z0-9\-]{6,})",
+        text,
+        re.IGNORECASE,
+    )
+    return claim_match.group(1).strip() if claim_match else ""
+
+
+def redact_estimate_text(text: str, *, claim_number: Optional[str] = None) -> str:
     """
     Two-pass PII redaction on extracted estimate text.
     Returns redacted text; labels are preserved, values replaced with [REDACTED].
+
+    claim_number: pass the document-level claim number when redacting a single
+    page, so running headers are stripped even on pages that never label it.
     """
     if not text:
         return text
 
     # ── Capture claim number before redacting (needed for header stripping) ──
-    claim_match = re.search(
-        r"(?:Claim(?:\s*Number)?)\s*:?\s*([A-Z0-9\-]{6,})",
-        text,
-        re.IGNORECASE,
-    )
-    claim_number = claim_match.group(1).strip() if claim_match else ""
+    if claim_number is None:
+        claim_number = _find_claim_number(text)
 
     # ── Pass A: label-based line redaction ───────────────────────────────────
     redacted = _LABEL_RE.sub(lambda m: m.group(1) + "[REDACTED]", text)
@@ -126,17 +328,53 @@ def redact_estimate_text(text: str) -> str:
     return redacted
 
 
-def extract_pdf_pages_text(pdf_bytes: bytes) -> List[Dict[str, Any]]:
-    packets: List[Dict[str, Any]] = []
-    with pdfplumber.open(BytesIO(pdf_bytes)) as pdf:
-        for i, page in enumerate(pdf.pages, start=1):
-            text = page.extract_text() or ""
-            packets.append({"page": i, "text": text, "method": "pdfplumber"})
-    return packets
 
-
-def join_page_packets(packets: List[Dict[str, Any]]) -> str:
-    parts = []
+def redact_page_packets(packets: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Redact each page using the claim number found anywhere in the document.
+    join_page_packets() over the result matches redacting the joined text.
+    """
+    claim_number = _find_claim_number(join_page_packets(packets))
+    redacted = []
     for p in packets:
-        parts.append(f"\n--- PAGE {p['page']} ---\n{p['text']}".rstrip())
-    return "\n".join(parts).strip()
\ No newline at end of file
+        packet = {**p, "text": redact_estimate_text(p["text"], claim_number=claim_number)}
+        if "rows" in p:
+            packet["rows"] = [
+                {**r, "lead": redact_estimate_text(r["lead"], claim_number=claim_number)}
+                for r in p["rows"]
+            ]
+        redacted.append(packet)
+    return redacted
+
+
+# ── Content-addressed cache ──────────────────────────────────────────────────
+
+def extract_redacted_pdfs(
+    pdfs: List[bytes],
+    *,
+    digests: Optional[List[str]] = None,
+    workers: Optional[int] = None,
+    mode: Optional[str] = None,
+) -> List[List[Dict[str, Any]]]:
+    """
+    Redacted page packets for each PDF, in input order.
+    Checks the on-disk extraction cache (keyed on SHA-256 of the bytes and the
+    extraction mode) first; only cache misses go through pdfplumber, and their
+    results are stored.
+    """
+    mode = mode or PDF_EXTRACT_MODE
+    if digests is None:
+        digests = [pdf_digest(b) for b in pdfs]
+
+    results: List[Optional[List[Dict[str, Any]]]] = [load_redacted_pages(d, mode) for d in digests]
+    misses = [i for i, r in enumerate(results) if r is None]
+    print(f"[CACHE] extraction cache: {len(pdfs) - len(misses)} hit(s), {len(misses)} miss(es)")
+
+    if misses:
+        extracted = extract_many_pdfs_pages_text([pdfs[i] for i in misses], workers=workers, mode=mode)
+        for i, packets in zip(misses, extracted):
+            redacted = redact_page_packets(packets)
+            store_redacted_pages(digests[i], mode, redacted)
+            results[i] = redacted
+
+    return results
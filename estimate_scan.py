@@ -0,0 +1,383 @@
+# estimate_scan.py
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from keyword_index import KeywordIndex, TaggedLine
+from line_items import LineItemParser, LineItemRow
+from money_lines import MoneyLine, atomic_line_amount, clean_line
+
+# ==========================================
+# SINGLE-PASS SCANNER
+# ==========================================
+# Money lines, room totals, key numbers and the renovation keyword filter all
+# read the same redacted estimate text line by line. The scanner splits and
+# cleans each line once and hands it to every registered extractor, so a
+# large estimate is traversed once instead of once per extractor.
+
+
+@dataclass(frozen=True)
+class ScannedLine:
+    raw_line_no: int   # index in text.splitlines()
+    raw: str           # line as extracted
+    stripped: str      # raw.strip()
+    cleaned: str       # whitespace collapsed (money_lines.clean_line)
+
+
+def iter_scanned_lines(text: str) -> Iterator[ScannedLine]:
+    """Non-blank lines of `text`, each split and cleaned exactly once."""
+    for raw_i, raw in enumerate(text.splitlines()):
+        stripped = raw.strip()
+        if not stripped:
+            continue
+        yield ScannedLine(
+            raw_line_no=raw_i,
+            raw=raw,
+            stripped=stripped,
+            cleaned=clean_line(stripped),
+        )
+
+
+class LineExtractor:
+    """
+    One consumer of the scan. feed() sees every non-blank line in order;
+    result() is called once after the last line.
+    """
+
+    name = ""
+
+    def feed(self, line: ScannedLine) -> None:
+        raise NotImplementedError
+
+    def result(self) -> Any:
+        raise NotImplementedError
+
+
+def run_scan(text: str, extractors: Sequence[LineExtractor]) -> Dict[str, Any]:
+    """Traverse `text` once, dispatching each line to all extractors. Returns {name: result}."""
+    if text:
+        feeds = [e.feed for e in extractors]
+        for line in iter_scanned_lines(text):
+            for feed in feeds:
+                feed(line)
+    return {e.name: e.result() for e in extractors}
+
+
+# ==========================================
+# MONEY LINES
+# ==========================================
+
+class AtomicMoneyLines(LineExtractor):
+    """Same output as money_lines.extract_atomic_money_lines."""
+
+    name = "money_lines"
+
+    def __init__(self, *, min_abs_amount: Decimal = Decimal("0.01")) -> None:
+        self.min_abs_amount = min_abs_amount
+        self._out: List[MoneyLine] = []
+
+    def feed(self, line: ScannedLine) -> None:
+        amt = atomic_line_amount(line.cleaned, min_abs_amount=self.min_abs_amount)
+        if amt is None:
+            return
+        self._out.append(
+            MoneyLine(
+                id=len(self._out),
+                raw_line_no=line.raw_line_no,
+                text=line.cleaned,
+                amount=amt,
+            )
+        )
+
+    def result(self) -> List[MoneyLine]:
+        return self._out
+
+
+# ==========================================
+# LINE-ITEM ROWS (all columns)
+# ==========================================
+
+class LineItems(LineExtractor):
+    """Typed Xactimate rows (qty, unit, price, tax, O&P, RCV, depreciation, ACV); see line_items."""
+
+    name = "line_items"
+
+    def __init__(self) -> None:
+        self._parser = LineItemParser()
+
+    def feed(self, line: ScannedLine) -> None:
+        self._parser.feed(line.raw_line_no, line.cleaned)
+
+    def result(self) -> List[LineItemRow]:
+        return self._parser.rows
+
+
+# ==========================================
+# ROOM TOTALS
+# ==========================================
+
+ROOM_TOTAL_LINE_RE = re.compile(r"^\s*Totals:\s*(.+?)\s+(.*)$")
+MONEY_RE = re.compile(r"(\d{1,3}(?:,\d{3})*(?:\.\d{2})|\d+(?:\.\d{2}))")
+
+# things that show up as "Totals:" but are NOT rooms
+NON_ROOM_TOTAL_LABELS = {
+    "Labor Minimums Applied",
+    "Line Item Totals",
+    "Recap of Taxes, Overhead and Profit",
+}
+
+# floor/sketch groupings (extra guard even though we ignore Area Totals already)
+NON_ROOM_NAME_EXACT = {
+    "Main Level",
+    "First Floor",
+    "Second Floor",
+    "Upper Level",
+    "Lower Level",
+    "Labor",
+}
+NON_ROOM_PREFIXES = ("SKETCH",)
+
+
+class RoomTotals(LineExtractor):
+    """
+    Explicitly-provided room totals: {room_name: "$1,234.56"}.
+    Only trusts lines that start with "Totals:" and have a clear final numeric total.
+    """
+
+    name = "room_totals"
+
+    def __init__(self) -> None:
+        self._out: Dict[str, str] = {}
+
+    def feed(self, line: ScannedLine) -> None:
+        text = line.stripped
+        if not text.startswith("Totals:"):
+            return
+
+        m = ROOM_TOTAL_LINE_RE.match(text)
+        if not m:
+            return
+
+        room = m.group(1).strip()
+
+        # Reject known non-room labels
+        if room in NON_ROOM_TOTAL_LABELS:
+            return
+
+        # Reject floor/group labels if they ever appear under Totals:
+        if room in NON_ROOM_NAME_EXACT:
+            return
+        if any(room.upper().startswith(pfx) for pfx in NON_ROOM_PREFIXES):
+            return
+
+        # Find numeric tokens on the rest of the line; use the LAST one as the total.
+        nums = MONEY_RE.findall(m.group(2))
+        if not nums:
+            return
+
+        # Re-add "$" for display consistency (the text sometimes omits $)
+        self._out[room] = f"${nums[-1]}"
+
+    def result(self) -> Dict[str, str]:
+        return self._out
+
+
+# ==========================================
+# KEY NUMBERS
+# ==========================================
+
+# One alternation scanned once per line (finditer). Each keyword is its own
+# token so a greedy match can't hide a later one; the label is then resolved
+# from the tokens seen, in the fixed priority order below (first = wins):
+#
+#   rcv > acv > depreciation > deductible > net claim > net payment > O&P > sales tax
+#
+# IMPORTANT: Keep Net Claim and Net Payment separate.
+# - "Net Claim" needs "net" followed later on the line by "claim"
+# - "Net Payment" ONLY when explicit payment language follows "net"
+# Lines with any skip token are ignored (they often contain amounts but are
+# NOT the key numbers we want). The amount is the first money token.
+_KEY_TOKEN_RE = re.compile(
+    r"""
+      (?P<skip>\b(?:page|subtotal\ by\ room|totals:|line\ item\ totals|labor\ minimums\ applied|recap\ of\ taxes)\b)
+    | (?P<rcv>\b(?:replacement\ cost\ value|rcv)\b)
+    | (?P<acv>\b(?:actual\ cash\ value|acv)\b)
+    | (?P<depreciation>\bdepreciation\b)
+    | (?P<deductible>\bdeductible\b)
+    | (?P<net>\bnet\b)
+    | (?P<claim>\bclaim\b)
+    | (?P<payment>\b(?:payment|paid|check|disbursement)\b)
+      # Overhead & Profit: require explicit O&P wording (do NOT match "Line Item Totals")
+    | (?P<op>\b(?:overhead\s*&\s*profit|overhead\s+and\s+profit|\bo\s*&\s*p\b)\b)
+      # Sales Tax: only "sales tax" (avoid generic "tax" lines like recap/total tax)
+    | (?P<sales_tax>\bsales\s*tax\b)
+    | (?P<money>\$?\s*(?P<amount>\d{1,3}(?:,\d{3})*(?:\.\d{2})|\d+(?:\.\d{2})))
+    """,
+    re.I | re.X,
+)
+
+# token kind -> (priority, label); net_claim / net_payment are derived
+_KEY_LABELS = {
+    "rcv": (0, "Replacement Cost Value (RCV)"),
+    "acv": (1, "Actual Cash Value (ACV)"),
+    "depreciation": (2, "Depreciation"),
+    "deductible": (3, "Deductible"),
+    "net_claim": (4, "Net Claim"),
+    "net_payment": (5, "Net Payment"),
+    "op": (6, "Overhead & Profit"),
+    "sales_tax": (7, "Sales Tax"),
+}
+
+
+# Every label token contains one of these (after casefold), so lines without
+# any hint are skipped with plain substring checks before the regex runs.
+# Hints avoid "i": re.I also matches dotted/dotless I, which casefold keeps apart.
+_KEY_HINTS = ("rcv", "replacement cost value", "acv", "actual cash value",
+              "deprec", "deduct", "net", "overhead", "&", "sales")
+
+
+def key_number_for_line(line: str) -> Optional[Tuple[str, str]]:
+    """(label, "$amount") for one stripped line, or None."""
+    folded = line.casefold()
+    if not any(h in folded for h in _KEY_HINTS):
+        return None
+
+    amount: Optional[str] = None
+    best: Optional[Tuple[int, str]] = None
+    seen_net = False
+
+    for m in _KEY_TOKEN_RE.finditer(line):
+        kind = m.lastgroup
+        if kind == "skip":
+            return None
+        if kind == "money":
+            if amount is None:
+                amount = m.group("amount")
+            continue
+        if kind == "net":
+            seen_net = True
+            continue
+        if kind == "claim" or kind == "payment":
+            if not seen_net:
+                continue
+            kind = "net_" + kind
+
+        entry = _KEY_LABELS[kind]
+        if best is None or entry < best:
+            best = entry
+
+    if amount is None or best is None:
+        return None
+    return best[1], f"${amount}"
+
+
+class KeyNumbers(LineExtractor):
+    """
+    Explicitly labeled summary numbers (RCV, ACV, Depreciation, Deductible,
+    Overhead & Profit, Sales Tax, Net Claim, Net Payment). The LAST matching
+    occurrence wins (often the most final summary).
+    """
+
+    name = "key_numbers"
+
+    def __init__(self) -> None:
+        self._out: Dict[str, str] = {}
+
+    def feed(self, line: ScannedLine) -> None:
+        text = line.stripped
+
+        # quick skip: if no digits at all, it can't contain an amount
+        if not any(ch.isdigit() for ch in text):
+            return
+
+        hit = key_number_for_line(text)
+        if hit is not None:
+            label, amt = hit
+            self._out[label] = amt
+
+    def result(self) -> Dict[str, str]:
+        return self._out
+
+
+# ==========================================
+# KEYWORD TAGS (renovation filter)
+# ==========================================
+
+class KeywordTags(LineExtractor):
+    """
+    Raw lines that contain any indexed term (case-insensitive substring),
+    tagged with every matched term per group. One automaton pass per line.
+    """
+
+    name = "keyword_tags"
+
+    def __init__(self, index: KeywordIndex) -> None:
+        self.index = index
+        self._out: List[TaggedLine] = []
+
+    def feed(self, line: ScannedLine) -> None:
+        if not self.index.terms:
+            return
+        tags = self.index.tags(line.raw)
+        if tags:
+            self._out.append(
+                TaggedLine(
+                    raw_line_no=line.raw_line_no,
+                    text=line.raw,
+                    tags={g: frozenset(ts) for g, ts in tags.items()},
+                )
+            )
+
+    def result(self) -> List[TaggedLine]:
+        return self._out
+
+
+# ==========================================
+# CONVENIENCE
+# ==========================================
+
+@dataclass
+class EstimateScan:
+    money_lines: List[MoneyLine] = field(default_factory=list)
+    room_totals: Dict[str, str] = field(default_factory=dict)
+    key_numbers: Dict[str, str] = field(default_factory=dict)
+    keyword_tags: List[TaggedLine] = field(default_factory=list)
+    line_items: List[LineItemRow] = field(default_factory=list)
+
+
+def scan_estimate_text(
+    text: str,
+    *,
+    keyword_index: Optional[KeywordIndex] = None,
+    min_abs_amount: Decimal = Decimal("0.01"),
+) -> EstimateScan:
+    """Money lines, line-item rows, room totals, key numbers (and keyword-tagged lines if an index is given) in one pass."""
+    extractors: List[LineExtractor] = [
+        AtomicMoneyLines(min_abs_amount=min_abs_amount),
+        LineItems(),
+        RoomTotals(),
+        KeyNumbers(),
+    ]
+    if keyword_index is not None:
+        extractors.append(KeywordTags(keyword_index))
+
+    return EstimateScan(**run_scan(text, extractors))
+
+
+def extract_room_totals_from_text(extracted_text: str) -> Dict[str, str]:
+    return run_scan(extracted_text, [RoomTotals()])["room_totals"]
+
+
+def extract_key_numbers_from_text(extracted_text: str) -> Dict[str, str]:
+    return run_scan(extracted_text, [KeyNumbers()])["key_numbers"]
+
+
+def tag_lines_by_keywords(text: str, index: KeywordIndex) -> List[TaggedLine]:
+    return run_scan(text, [KeywordTags(index)])["keyword_tags"]
+
+
+def filter_lines_by_keywords(text: str, terms: Iterable[str]) -> List[str]:
+    return [t.text for t in tag_lines_by_keywords(text, KeywordIndex({"term": terms}))]
@@ -0,0 +1,120 @@
+# extract_cache.py
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+from typing import Any, Dict, List, Optional
+
+# ==========================================
+# CONFIG
+# ==========================================
+# Redacted page packets are stored on local disk, one JSON file per PDF and
+# extraction mode (estimate_extract.PDF_EXTRACT_MODE), named by the SHA-256 of
+# the PDF bytes. Every Streamlit session and worker process on the host shares
+# the same directory.
+
+EXTRACT_CACHE_DIR = os.getenv(
+    "EXTRACT_CACHE_DIR",
+    os.path.join(tempfile.gettempdir(), "estimate_extract_cache"),
+)
+EXTRACT_CACHE_MAX_MB = int(os.getenv("EXTRACT_CACHE_MAX_MB", "256"))
+
+# Bump when extraction or redaction output changes so stale entries miss
+EXTRACT_CACHE_VERSION = 1
+
+
+def pdf_digest(pdf_bytes: bytes) -> str:
+    return hashlib.sha256(pdf_bytes).hexdigest()
+
+
+def _entry_path(digest: str, mode: str) -> str:
+    return os.path.join(EXTRACT_CACHE_DIR, f"{digest}.{mode}.json")
+
+
+def load_redacted_pages(digest: str, mode: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    Return cached redacted page packets for this PDF digest and extraction
+    mode, or None on a miss. A hit refreshes the entry's mtime, which is what
+    LRU eviction orders by.
+    """
+    path = _entry_path(digest, mode)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if entry.get("version") != EXTRACT_CACHE_VERSION or entry.get("mode") != mode:
+        return None
+
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
+
+    return entry.get("pages")
+
+
+def store_redacted_pages(digest: str, mode: str, pages: List[Dict[str, Any]]) -> None:
+    """
+    Write redacted page packets for this digest and extraction mode. Only
+    redacted text belongs here; raw pdfplumber output must never be cached.
+    """
+    tmp_path = None
+    try:
+        os.makedirs(EXTRACT_CACHE_DIR, exist_ok=True)
+
+        # Write to a temp file then rename, so readers in other processes
+        # never see a half-written entry
+        fd, tmp_path = tempfile.mkstemp(dir=EXTRACT_CACHE_DIR, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"version": EXTRACT_CACHE_VERSION, "mode": mode, "pages": pages}, f, ensure_ascii=False)
+        os.replace(tmp_path, _entry_path(digest, mode))
+    except (OSError, TypeError, ValueError) as e:
+        print(f"[CACHE] extraction cache write failed ({digest[:12]}): {e}")
+        # Eviction only counts *.json, so a leftover temp file would never be reclaimed
+        if tmp_path is not None:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+        return
+
+    _evict_if_needed()
+
+
+def _evict_if_needed() -> None:
+    """Drop least-recently-used entries until the cache fits EXTRACT_CACHE_MAX_MB."""
+    max_bytes = EXTRACT_CACHE_MAX_MB * 1024 * 1024
+
+    entries = []
+    total = 0
+    try:
+        with os.scandir(EXTRACT_CACHE_DIR) as it:
+            for de in it:
+                if not de.name.endswith(".json"):
+                    continue
+                try:
+                    st = de.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, de.path))
+                total += st.st_size
+    except OSError:
+        return
+
+    if total <= max_bytes:
+        return
+
+    entries.sort()
+    for _mtime, size, path in entries:
+        try:
+            os.remove(path)
+        except OSError:
+            # Another process may have evicted it already
+            pass
+        total -= size
+        if total <= max_bytes:
+            break
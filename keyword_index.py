@@ -0,0 +1,110 @@
+# keyword_index.py
+from __future__ import annotations
+
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, List, Sequence, Set, Tuple
+
+# ==========================================
+# AHO-CORASICK KEYWORD INDEX
+# ==========================================
+# The renovation filter checks every estimate line against every room and
+# work term (dozens after expand_work_terms). This compiles all terms once into
+# an Aho-Corasick automaton so each line is matched in a single pass over its
+# characters, and reports WHICH terms matched so lines can be ranked.
+#
+# Matching is case-insensitive substring matching ("roof" hits "Roofing"),
+# the same semantics as `term in line.lower()`.
+
+
+class KeywordIndex:
+    """
+    Multi-term substring matcher.
+
+        index = KeywordIndex({"room": ["kitchen"], "work": ["roof", "tile roof"]})
+        index.tags("R&R tile roof - Kitchen")  # {"room": {"kitchen"}, "work": {"roof", "tile roof"}}
+    """
+
+    def __init__(self, groups: Dict[str, Iterable[str]]) -> None:
+        # term -> groups it belongs to (a term can be both a room and a work term)
+        term_groups: Dict[str, Set[str]] = {}
+        for group, terms in groups.items():
+            for t in terms:
+                t = (t or "").lower()
+                if t:
+                    term_groups.setdefault(t, set()).add(group)
+
+        self.groups: Tuple[str, ...] = tuple(groups)
+        self.terms: Tuple[str, ...] = tuple(term_groups)
+        self._term_groups: Tuple[FrozenSet[str], ...] = tuple(frozenset(term_groups[t]) for t in self.terms)
+        self._delta, self._out = self._build(self.terms)
+
+    @staticmethod
+    def _build(terms: Sequence[str]) -> Tuple[List[Dict[str, int]], List[Tuple[int, ...]]]:
+        # Trie
+        goto: List[Dict[str, int]] = [{}]
+        out: List[Set[int]] = [set()]
+        for term_id, term in enumerate(terms):
+            state = 0
+            for ch in term:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    out.append(set())
+                state = nxt
+            out[state].add(term_id)
+
+        # Failure links (BFS), folded into a full transition table so matching
+        # never walks fail chains: delta[s][ch] is the next state, missing = root.
+        fail = [0] * len(goto)
+        delta: List[Dict[str, int]] = [dict(g) for g in goto]
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            f = fail[state]
+            out[state] |= out[f]
+            # Inherit transitions the failure state has but this state lacks
+            for ch, nxt in delta[f].items():
+                delta[state].setdefault(ch, nxt)
+            for ch, child in goto[state].items():
+                queue.append(child)
+                fail[child] = delta[f].get(ch, 0)
+
+        return delta, [tuple(sorted(o)) for o in out]
+
+    def match_ids(self, text: str) -> Set[int]:
+        """Ids (into self.terms) of every term occurring in text."""
+        delta = self._delta
+        out = self._out
+        state = 0
+        hits: Set[int] = set()
+        for ch in text.lower():
+            state = delta[state].get(ch, 0)
+            if out[state]:
+                hits.update(out[state])
+        return hits
+
+    def matches(self, text: str) -> Set[str]:
+        return {self.terms[i] for i in self.match_ids(text)}
+
+    def tags(self, text: str) -> Dict[str, Set[str]]:
+        """{group: matched terms} for groups with at least one hit."""
+        out: Dict[str, Set[str]] = {}
+        for i in self.match_ids(text):
+            for group in self._term_groups[i]:
+                out.setdefault(group, set()).add(self.terms[i])
+        return out
+
+
+@dataclass(frozen=True)
+class TaggedLine:
+    raw_line_no: int
+    text: str
+    tags: Dict[str, FrozenSet[str]]   # group -> matched terms
+
+    @property
+    def relevance(self) -> int:
+        """Number of distinct matched terms across groups."""
+        return len(set().union(*self.tags.values())) if self.tags else 0
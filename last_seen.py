@@ -0,0 +1,108 @@
+# last_seen.py
+from __future__ import annotations
+
+import atexit
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from db import get_pool
+
+# ==========================================
+# CONFIG
+# ==========================================
+# Session "last seen" timestamps are coalesced in memory and written in one
+# batched UPDATE per interval, instead of one UPDATE per Streamlit rerun.
+
+LAST_SEEN_FLUSH_INTERVAL_S = float(os.getenv("LAST_SEEN_FLUSH_INTERVAL_S", "30"))
+# At most one write per session per this many seconds
+LAST_SEEN_MIN_INTERVAL_S = float(os.getenv("LAST_SEEN_MIN_INTERVAL_S", "60"))
+
+_lock = threading.Lock()
+_pending: Dict[int, datetime] = {}        # session_id -> latest seen time
+_last_written: Dict[int, float] = {}      # session_id -> monotonic time of last write
+
+_stop = threading.Event()
+_thread: Optional[threading.Thread] = None
+
+
+def touch_session(session_id: int) -> None:
+    """Record activity for a session; written by the background flusher."""
+    now_m = time.monotonic()
+    with _lock:
+        last = _last_written.get(session_id)
+        if last is not None and now_m - last < LAST_SEEN_MIN_INTERVAL_S:
+            return
+        _pending[session_id] = datetime.now(timezone.utc)
+
+    _ensure_started()
+
+
+def flush_last_seen() -> int:
+    """Write all pending timestamps in one statement. Returns rows sent."""
+    with _lock:
+        batch = dict(_pending)
+        _pending.clear()
+
+    if not batch:
+        return 0
+
+    values_sql = ", ".join(["(%s::bigint, %s::timestamptz)"] * len(batch))
+    params = []
+    for session_id, seen_at in batch.items():
+        params.extend([session_id, seen_at])
+
+    q = f"""
+        UPDATE public.client_sessions AS s
+        SET last_seen_at = v.seen_at
+        FROM (VALUES {values_sql}) AS v(id, seen_at)
+        WHERE s.id = v.id
+          AND (s.last_seen_at IS NULL OR s.last_seen_at < v.seen_at)
+    """
+
+    try:
+        with get_pool().connection() as conn:
+            conn.execute(q, params)
+    except Exception as e:
+        print(f"last_seen flush error ({len(batch)} sessions): {e}")
+        # Put the batch back unless a newer touch already replaced it
+        with _lock:
+            for session_id, seen_at in batch.items():
+                _pending.setdefault(session_id, seen_at)
+        return 0
+
+    now_m = time.monotonic()
+    with _lock:
+        for session_id in batch:
+            _last_written[session_id] = now_m
+        # Forget sessions whose granularity window has passed
+        for session_id in [s for s, t in _last_written.items() if now_m - t >= LAST_SEEN_MIN_INTERVAL_S]:
+            del _last_written[session_id]
+
+    return len(batch)
+
+
+def _run() -> None:
+    while not _stop.wait(LAST_SEEN_FLUSH_INTERVAL_S):
+        flush_last_seen()
+
+
+def _ensure_started() -> None:
+    global _thread
+    if _thread is not None:
+        return
+    with _lock:
+        if _thread is None:
+            _thread = threading.Thread(target=_run, name="last-seen-flusher", daemon=True)
+            _thread.start()
+
+
+def shutdown_last_seen() -> None:
+    """Stop the flusher and write whatever is still pending."""
+    _stop.set()
+    flush_last_seen()
+
+
+atexit.register(shutdown_last_seen)
@@ -0,0 +1,306 @@
+# line_items.py
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from buckets import BUCKETS
+from money_lines import CONDITION_WORDS, LINE_ITEM_RE, clean_line
+
+# ==========================================
+# XACTIMATE LINE-ITEM ROWS
+# ==========================================
+# A numbered line item carries every column of the estimate table:
+#
+#   14. R&R Carpet pad 281.00 SF 0.64 12.59 17.98 210.41 (35.97) 174.44
+#   no  description    qty   unit price tax o&p  rcv    deprec. acv
+#
+# money_lines keeps only the last number. This parser splits the row into
+# typed fields, using the column header ("DESCRIPTION QUANTITY UNIT PRICE TAX
+# O&P RCV DEPREC. ACV") seen most recently in the text to decide which amount
+# is which. Rows that don't have the "<qty> <unit> <amounts...>" tail are left
+# to money_lines alone.
+
+AMOUNT_FIELDS: Tuple[str, ...] = ("unit_price", "tax", "o_and_p", "rcv", "depreciation", "acv")
+
+# Columns that can be added up per bucket (unit price can't)
+SUMMABLE_FIELDS: Tuple[str, ...] = ("tax", "o_and_p", "rcv", "depreciation", "acv")
+
+# Column order when no header has been seen (standard Xactimate layout)
+DEFAULT_LAYOUT: Tuple[str, ...] = AMOUNT_FIELDS
+
+_ZERO = Decimal("0.00")
+
+# Header columns that sit between the amounts but aren't money
+# ("... RCV AGE/LIFE COND. DEP % DEPREC. ACV" on estimates with depreciation)
+IGNORED_COLUMNS: Tuple[str, ...] = ("age_life", "condition", "dep_percent")
+
+# "1,234.56", "(35.97)", "<35.97>" (depreciation is bracketed)
+AMOUNT_TOKEN_RE = re.compile(r"^(?P<open>[(<])?(?P<num>-?(?:\d{1,3}(?:,\d{3})+|\d+)\.\d{2})(?P<close>[)>])?$")
+QTY_TOKEN_RE = re.compile(r"^(?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d+)?$")
+UNIT_TOKEN_RE = re.compile(r"^[A-Za-z]{1,4}$")
+
+# Cell values of IGNORED_COLUMNS in a row tail: "5/10", "0/NA", "yrs", "Avg.", "Below Avg.", "50%"
+NON_AMOUNT_TAIL_TOKEN_RE = re.compile(
+    r"^(?:\d+/(?:\d+|NA)|yrs?\.?|(?:" + "|".join(CONDITION_WORDS) + r")\.?|NA|\d+(?:\.\d+)?\s*%|%)$",
+    re.IGNORECASE,
+)
+
+HEADER_RE = re.compile(r"\bdescription\b.*\b(?:quantity|qty)\b", re.IGNORECASE)
+HEADER_COLUMN_RE = re.compile(
+    r"""
+    (?<![a-z])(?:
+        (?P<unit_price>unit\s*(?:price|cost)|replace)
+      | (?P<tax>tax)
+      | (?P<o_and_p>o\s*&\s*p)
+      | (?P<rcv>rcv|replacement\s+cost|total)
+      | (?P<age_life>age\s*/\s*life)
+      | (?P<condition>cond(?:ition)?\.?)
+      | (?P<dep_percent>dep\.?\s*%)
+      | (?P<depreciation>depreciation|deprec\.?|dep\.?)(?!\s*%)
+      | (?P<acv>acv)
+    )(?![a-z])
+    """,
+    re.IGNORECASE | re.VERBOSE,
+)
+
+
+@dataclass(frozen=True, slots=True)
+class LineItemRow:
+    raw_line_no: int                  # line index in the original text stream (joins to MoneyLine)
+    item_no: int                      # "14." prefix
+    description: str
+    qty: Decimal
+    unit: str
+    unit_price: Optional[Decimal] = None
+    tax: Optional[Decimal] = None
+    o_and_p: Optional[Decimal] = None
+    rcv: Optional[Decimal] = None
+    depreciation: Optional[Decimal] = None   # positive; shown bracketed in the estimate
+    acv: Optional[Decimal] = None
+
+
+def layout_from_header(line: str) -> Optional[Tuple[str, ...]]:
+    """Amount columns (after quantity/unit) named by a table header line, or None if it isn't one."""
+    m = HEADER_RE.search(line)
+    if not m:
+        return None
+
+    columns = tuple(cm.lastgroup for cm in HEADER_COLUMN_RE.finditer(line, m.end()))
+    if "unit_price" not in columns or len(set(columns)) != len(columns):
+        return None
+    return tuple(c for c in columns if c not in IGNORED_COLUMNS)
+
+
+def _to_decimal(token: str) -> Optional[Decimal]:
+    try:
+        return Decimal(token.replace(",", ""))
+    except InvalidOperation:
+        return None
+
+
+def parse_line_item(
+    cleaned: str,
+    *,
+    raw_line_no: int = 0,
+    layout: Sequence[str] = DEFAULT_LAYOUT,
+) -> Optional[LineItemRow]:
+    """
+    Typed row for one cleaned numbered line item, or None if the line doesn't
+    end in "<qty> <unit> <amount> ...".
+
+    When the number of amounts matches `layout` they are assigned by position.
+    Otherwise only the unambiguous ones are kept: unit price (first), the
+    bracketed depreciation, RCV before it and ACV after it (or RCV = last
+    amount when there is no depreciation column).
+    """
+    if not LINE_ITEM_RE.match(cleaned):
+        return None
+
+    tokens = cleaned.split(" ")
+    amounts: List[Tuple[Decimal, bool]] = []   # (value, bracketed), right to left
+    i = len(tokens) - 1
+    while i > 0:
+        m = AMOUNT_TOKEN_RE.match(tokens[i])
+        if amounts and not m and NON_AMOUNT_TAIL_TOKEN_RE.match(tokens[i]) and not _is_unit_at(tokens, i):
+            i -= 1   # age/life, condition, dep % between the amounts
+            continue
+        if not m or bool(m.group("open")) != bool(m.group("close")):
+            break
+        val = _to_decimal(m.group("num"))
+        if val is None:
+            return None
+        amounts.append((val, bool(m.group("open"))))
+        i -= 1
+
+    # tokens[:i + 1] -> item no, description, qty, unit
+    lead = _split_lead(tokens[:i + 1])
+    if not amounts or lead is None:
+        return None
+
+    amounts.reverse()
+    fields: Dict[str, Decimal] = {}
+    if len(amounts) == len(layout):
+        for name, (val, bracketed) in zip(layout, amounts):
+            fields[name] = abs(val) if bracketed else val
+    else:
+        fields["unit_price"] = amounts[0][0]
+        dep_i = next((k for k, (_, bracketed) in enumerate(amounts) if bracketed), None)
+        if dep_i is not None:
+            fields["depreciation"] = abs(amounts[dep_i][0])
+            if dep_i >= 2:
+                fields["rcv"] = amounts[dep_i - 1][0]
+            if dep_i + 1 < len(amounts):
+                fields["acv"] = amounts[dep_i + 1][0]
+        elif len(amounts) >= 2:
+            fields["rcv"] = amounts[-1][0]
+
+    item_no, description, qty, unit = lead
+    return LineItemRow(raw_line_no, item_no, description, qty, unit, **fields)
+
+
+def line_item_from_cells(
+    lead: str,
+    cells: Mapping[str, str],
+    *,
+    raw_line_no: int = 0,
+) -> Optional[LineItemRow]:
+    """
+    Typed row from column-assigned cells (table-aware PDF extraction, see
+    column_layout): `lead` is "<no>. <description> <qty> <unit>", `cells` maps
+    amount field -> cell text. Blank columns simply stay None.
+
+    Returns None when the row doesn't fit the columns (a cell holding more
+    than one amount, brackets outside depreciation, no unit price), which is
+    what text that isn't laid out under the header looks like.
+    """
+    cleaned = clean_line(lead)
+    if not LINE_ITEM_RE.match(cleaned):
+        return None
+    parsed = _split_lead(cleaned.split(" "))
+    if parsed is None or not cells.get("unit_price"):
+        return None
+
+    fields: Dict[str, Decimal] = {}
+    for name, cell in cells.items():
+        m = AMOUNT_TOKEN_RE.match(cell.strip())
+        if name not in AMOUNT_FIELDS or not m or bool(m.group("open")) != bool(m.group("close")):
+            return None
+        if m.group("open") and name != "depreciation":
+            return None
+        val = _to_decimal(m.group("num"))
+        if val is None:
+            return None
+        fields[name] = abs(val) if m.group("open") else val
+
+    item_no, description, qty, unit = parsed
+    return LineItemRow(raw_line_no, item_no, description, qty, unit, **fields)
+
+
+def merge_line_items(
+    parsed: Iterable[LineItemRow],
+    column_rows: Iterable[LineItemRow],
+) -> List[LineItemRow]:
+    """Text-parsed rows with column-assigned rows taking precedence on the same line, in line order."""
+    by_line = {row.raw_line_no: row for row in parsed}
+    by_line.update((row.raw_line_no, row) for row in column_rows)
+    return [by_line[k] for k in sorted(by_line)]
+
+
+def _is_unit_at(tokens: Sequence[str], i: int) -> bool:
+    """tokens[i] is the unit of "<qty> <unit>" (e.g. "2.00 YR"), not an age/life cell."""
+    return i >= 2 and bool(UNIT_TOKEN_RE.match(tokens[i])) and bool(QTY_TOKEN_RE.match(tokens[i - 1]))
+
+
+def _split_lead(tokens: Sequence[str]) -> Optional[Tuple[int, str, Decimal, str]]:
+    """["14.", *description, qty, unit] -> (item_no, description, qty, unit)."""
+    if len(tokens) < 4:
+        return None
+    if not UNIT_TOKEN_RE.match(tokens[-1]) or not QTY_TOKEN_RE.match(tokens[-2]):
+        return None
+    qty = _to_decimal(tokens[-2])
+    if qty is None:
+        return None
+    return int(tokens[0].rstrip(".")), " ".join(tokens[1:-2]), qty, tokens[-1]
+
+
+class LineItemParser:
+    """Stateful parser: tracks the latest table header so each page's layout applies to its rows."""
+
+    def __init__(self, layout: Sequence[str] = DEFAULT_LAYOUT) -> None:
+        self.layout: Tuple[str, ...] = tuple(layout)
+        self.rows: List[LineItemRow] = []
+        self._warned_header = False
+
+    def feed(self, raw_line_no: int, cleaned: str) -> Optional[LineItemRow]:
+        if not LINE_ITEM_RE.match(cleaned):
+            layout = layout_from_header(cleaned)
+            if layout is not None:
+                self.layout = layout
+            elif not self._warned_header and HEADER_RE.search(cleaned):
+                # Amounts keep the previous layout; tax / O&P may land in the wrong field
+                print(f"[LINE_ITEMS] unrecognized column header, keeping {self.layout}: {cleaned[:120]!r}")
+                self._warned_header = True
+            return None
+
+        row = parse_line_item(cleaned, raw_line_no=raw_line_no, layout=self.layout)
+        if row is not None:
+            self.rows.append(row)
+        return row
+
+
+def extract_line_items(text: str) -> List[LineItemRow]:
+    """Every parseable numbered line item in `text`, in document order."""
+    parser = LineItemParser()
+    for raw_i, line in enumerate(text.splitlines()):
+        cleaned = clean_line(line)
+        if cleaned:
+            parser.feed(raw_i, cleaned)
+    return parser.rows
+
+
+# ==========================================
+# PER-BUCKET COLUMN TOTALS
+# ==========================================
+
+def column_totals_by_bucket(
+    rows: Iterable[LineItemRow],
+    bucket_by_raw_line: Mapping[int, str],
+) -> Dict[str, Dict[str, object]]:
+    """
+    {bucket: {"rows": n, "tax": Decimal, "o_and_p": ..., "rcv": ..., "depreciation": ..., "acv": ...}}
+    in BUCKETS order. Rows are joined to buckets by raw_line_no (the bucketed
+    MoneyLine on the same line); rows with no money line are skipped. Missing
+    cells count as 0. One integer-cents np.add.at pass over all rows.
+    """
+    codes: List[int] = []
+    cents: List[List[int]] = []
+    code_of = {b: i for i, b in enumerate(BUCKETS)}
+    other = code_of["other"]
+
+    for row in rows:
+        bucket = bucket_by_raw_line.get(row.raw_line_no)
+        if bucket is None:
+            continue
+        codes.append(code_of.get(bucket, other))
+        cents.append([int(((getattr(row, f) or _ZERO) * 100).to_integral_value()) for f in SUMMABLE_FIELDS])
+
+    sums = np.zeros((len(BUCKETS), len(SUMMABLE_FIELDS)), dtype=np.int64)
+    counts = np.zeros(len(BUCKETS), dtype=np.int64)
+    if codes:
+        code_arr = np.asarray(codes, dtype=np.intp)
+        np.add.at(sums, code_arr, np.asarray(cents, dtype=np.int64))
+        np.add.at(counts, code_arr, 1)
+
+    out: Dict[str, Dict[str, object]] = {}
+    for code in np.flatnonzero(counts).tolist():
+        totals: Dict[str, object] = {"rows": int(counts[code])}
+        for f, c in zip(SUMMABLE_FIELDS, sums[code].tolist()):
+            totals[f] = Decimal(c).scaleb(-2)
+        out[BUCKETS[code]] = totals
+    return out
+
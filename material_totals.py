@@ -1,11 +1,13 @@
 # material_totals.py
 from __future__ import annotations
 
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 from decimal import Decimal
 
-from money_lines import extract_atomic_money_lines
+from money_lines import MoneyLine, extract_atomic_money_lines
 from bucketing import bucket_money_lines
+from estimate_diff import diff_money_lines
+from line_items import LineItemRow, column_totals_by_bucket, extract_line_items
 from summation import sum_by_bucket
 from buckets import BUCKETS
 import time
@@ -16,16 +18,31 @@ def compute_material_totals(
     model: str,
     extracted_text: str,
     min_abs_amount: Decimal = Decimal("0.01"),
+    money_lines: Optional[List[MoneyLine]] = None,
+    previous: Optional[Dict[str, Any]] = None,
+    line_items: Optional[List[LineItemRow]] = None,
 ) -> Dict[str, Any]:
+    """
+    money_lines: atomic lines already extracted from extracted_text (e.g. by
+    estimate_scan.scan_estimate_text); skips re-scanning the text when given.
+
+    previous: an earlier result of this function for the same document slot
+    (revised estimate). Lines whose normalized text matches a previous line
+    keep its bucket; only new descriptions are classified.
+
+    line_items: typed rows for the same text (line_items / the scanner); parsed
+    here when not given. Used for per-bucket RCV / O&P / depreciation / ACV.
+    """
 
     # ----------------------------
     # Atomic extraction timing
     # ----------------------------
     t0 = time.perf_counter()  # time debug
-    money_lines = extract_atomic_money_lines(
-        extracted_text,
-        min_abs_amount=min_abs_amount,
-    )
+    if money_lines is None:
+        money_lines = extract_atomic_money_lines(
+            extracted_text,
+            min_abs_amount=min_abs_amount,
+        )
     t1 = time.perf_counter()  # time debug
     atomic_time = t1 - t0     # time debug
     print("[DEBUG] BUCKETING money_lines count:", len(money_lines))
@@ -39,11 +56,27 @@ def compute_material_totals(
     # Bucketing LLM timing
     # ----------------------------
     t0 = time.perf_counter()  # time debug
+    bucket_sources: Dict[str, int] = {}
+    diff = None
+    to_classify = money_lines
+    if previous:
+        diff = diff_money_lines(previous["money_lines"], previous["bucket_map"], money_lines)
+        to_classify = diff.added
+        print(
+            f"[BUCKETING] revision: {diff.unchanged} unchanged, {len(diff.changed)} changed, "
+            f"{len(diff.added)} added, {len(diff.removed)} removed"
+        )
+
     bucket_map = bucket_money_lines(
         client,
         model,
-        money_lines,
-    )
+        to_classify,
+        stats=bucket_sources,
+    ) if to_classify else {}
+
+    if diff is not None:
+        bucket_map.update(diff.reused)
+        bucket_sources["previous"] = len(diff.reused)
     t1 = time.perf_counter()  # time debug
     bucket_time = t1 - t0     # time debug
 
@@ -63,6 +96,15 @@ def compute_material_totals(
         if amt != Decimal("0.00"):
             ordered.append((b, amt))
 
+    # Every estimate column per bucket, joined to money lines by raw line number
+    if line_items is None:
+        line_items = extract_line_items(extracted_text)
+    bucket_by_raw_line = {ml.raw_line_no: bucket_map.get(ml.id, "other") for ml in money_lines}
+    column_totals = column_totals_by_bucket(line_items, bucket_by_raw_line)
+
+    # Change vs the previous run, per bucket (removed lines count as negative)
+    bucket_deltas = diff.bucket_deltas(bucket_map) if diff is not None else {}
+
     # ----------------------------
     # Return results + timings
     # ----------------------------
@@ -71,6 +113,10 @@ def compute_material_totals(
         "bucket_map": bucket_map,
         "totals_ordered": ordered,           # list[(bucket, Decimal)]
         "grouped": grouped,                  # bucket -> [MoneyLine]
+        "column_totals": column_totals,      # bucket -> {"rows", "tax", "o_and_p", "rcv", "depreciation", "acv"}
+        "bucket_sources": bucket_sources,    # lines resolved by rules / cache / llm / previous
+        "diff": diff,                        # LineDiff vs previous run, or None
+        "bucket_deltas": bucket_deltas,      # bucket -> Decimal change vs previous run
         "timings": {                         # time debug
             "atomic_extraction_s": atomic_time,
             "bucketing_llm_s": bucket_time,
@@ -4,7 +4,7 @@ from __future__ import annotations
 import re
 from dataclasses import dataclass
 from decimal import Decimal, InvalidOperation
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
 
 # Matches dollar amounts like "$1,234.56"
@@ -28,8 +28,13 @@ NUM_MONEY_RE = re.compile(r"\b\d{1,3}(?:,\d{3})*\.\d{2}\b")
 
 WHITESPACE_RE = re.compile(r"\s+")
 
+# Values of the Xactimate condition column ("Avg.", "Below Avg.", "Excellent").
+# line_items skips them in a row's amount tail; bucket_cache strips them from
+# the end of normalized line text.
+CONDITION_WORDS: Tuple[str, ...] = ("excellent", "good", "above", "average", "avg", "below", "fair", "poor", "new")
 
-@dataclass(frozen=True)
+
+@dataclass(frozen=True, slots=True)
 class MoneyLine:
     id: int                # line index in the filtered stream
     raw_line_no: int       # line index in the original text stream
@@ -37,7 +42,7 @@ class MoneyLine:
     amount: Decimal        # extracted line-item or $ amount
 
 
-def _clean_line(s: str) -> str:
+def clean_line(s: str) -> str:
     s = s.replace("\u00a0", " ")  # nbsp
     s = WHITESPACE_RE.sub(" ", s).strip()
     return s
@@ -75,7 +80,7 @@ def extract_money_lines(
     filtered_id = 0
 
     for raw_i, line in enumerate(lines):
-        cleaned = _clean_line(line)
+        cleaned = clean_line(line)
         if not cleaned:
             continue
 
@@ -114,6 +119,34 @@ def extract_money_lines(
 
     return out
 
+def atomic_line_amount(
+    cleaned: str,
+    *,
+    min_abs_amount: Decimal = Decimal("0.01"),
+) -> Optional[Decimal]:
+    """
+    Amount of a single cleaned line if it is an atomic numbered line item, else None.
+    Shared by extract_atomic_money_lines and the single-pass scanner (estimate_scan).
+    """
+    # Only numbered line items are eligible (atomic costs)
+    if not LINE_ITEM_RE.match(cleaned):
+        return None
+
+    # Grab the last money-like numeric token (RCV in Xactimate-like formats)
+    nums = NUM_MONEY_RE.findall(cleaned)
+    if not nums:
+        return None
+
+    token = nums[-1]
+    amt = _parse_money_token(token, sign=None)
+    if amt is None:
+        return None
+    if abs(amt) < min_abs_amount:
+        return None
+
+    return amt
+
+
 def extract_atomic_money_lines(
     text: str,
     *,
@@ -138,25 +171,13 @@ def extract_atomic_money_lines(
     filtered_id = 0
 
     for raw_i, line in enumerate(lines):
-        cleaned = _clean_line(line)
+        cleaned = clean_line(line)
         if not cleaned:
             continue
 
-        # Only numbered line items are eligible (atomic costs)
-        if not LINE_ITEM_RE.match(cleaned):
-            continue
-
-        # Grab the last money-like numeric token (RCV in Xactimate-like formats)
-        nums = NUM_MONEY_RE.findall(cleaned)
-        if not nums:
-            continue
-
-        token = nums[-1]
-        amt = _parse_money_token(token, sign=None)
+        amt = atomic_line_amount(cleaned, min_abs_amount=min_abs_amount)
         if amt is None:
             continue
-        if abs(amt) < min_abs_amount:
-            continue
 
         out.append(
             MoneyLine(
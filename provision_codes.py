@@ -0,0 +1,175 @@
+# provision_codes.py
+"""
+Bulk-provision contractor access codes.
+
+    python provision_codes.py --count 500 --status trial --trial-days 30 --out partner_codes.csv
+
+Generates N codes, computes HMACs and ciphertexts in bulk, checks collisions
+against contractors.access_code_hmac with one set-based query per round, and
+inserts all rows with a single COPY inside one transaction. The plaintext
+codes are written to a CSV (contractor_id, access_code) once the insert
+commits; they are not recoverable from the database except by decrypting
+access_code_encrypted. --out must not exist yet: it is created before
+anything is inserted, never overwritten, and only removed again when the
+insert did not happen.
+
+Required columns on public.contractors (auth.py only looks up
+access_code_hmac; the rest are written here):
+
+    access_code_hmac        text unique
+    access_code_encrypted   text   (Fernet token, access_codes.encrypt_codes)
+    access_code_key_version int    (access_codes.current_key_version)
+    subscription_status     text
+    trial_ends_at           timestamptz
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from access_codes import (
+    compute_hmac_many,
+    current_key_version,
+    encrypt_codes,
+    generate_access_code,
+)
+from db import close_pool, get_pool
+
+# Each round regenerates only the codes lost to collisions
+MAX_GENERATION_ROUNDS = 10
+
+
+def _existing_hmacs(conn, hmacs: List[str]) -> set:
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT access_code_hmac FROM public.contractors WHERE access_code_hmac = ANY(%s)",
+            (hmacs,),
+        )
+        return {r[0] for r in cur.fetchall()}
+
+
+def generate_unique_codes(conn, count: int, length: int = 8) -> Dict[str, str]:
+    """hmac -> code for `count` codes unique within the batch and against the table."""
+    accepted: Dict[str, str] = {}
+
+    for _ in range(MAX_GENERATION_ROUNDS):
+        need = count - len(accepted)
+        if need <= 0:
+            break
+
+        codes = [generate_access_code(length) for _ in range(need)]
+        fresh: Dict[str, str] = {}
+        for h, code in zip(compute_hmac_many(codes), codes):
+            if h not in accepted and h not in fresh:
+                fresh[h] = code
+
+        taken = _existing_hmacs(conn, list(fresh)) if fresh else set()
+        for h, code in fresh.items():
+            if h not in taken:
+                accepted[h] = code
+
+    if len(accepted) < count:
+        raise RuntimeError(
+            f"Only {len(accepted)} of {count} unique codes after {MAX_GENERATION_ROUNDS} rounds; "
+            "use a longer --length"
+        )
+    return accepted
+
+
+def insert_codes(
+    conn,
+    codes_by_hmac: Dict[str, str],
+    *,
+    status: str,
+    trial_ends_at: Optional[datetime],
+) -> List[Tuple[int, str]]:
+    """COPY the contractors rows in one transaction. Returns (contractor_id, code) pairs."""
+    hmacs = list(codes_by_hmac)
+    ciphertexts = encrypt_codes(codes_by_hmac[h] for h in hmacs)
+    key_version = current_key_version()
+
+    with conn.transaction():
+        with conn.cursor() as cur:
+            with cur.copy(
+                "COPY public.contractors "
+                "(access_code_hmac, access_code_encrypted, access_code_key_version, "
+                "subscription_status, trial_ends_at) FROM STDIN"
+            ) as copy:
+                for h, enc in zip(hmacs, ciphertexts):
+                    copy.write_row((h, enc, key_version, status, trial_ends_at))
+
+            cur.execute(
+                "SELECT id, access_code_hmac FROM public.contractors WHERE access_code_hmac = ANY(%s)",
+                (hmacs,),
+            )
+            ids = {h: cid for cid, h in cur.fetchall()}
+
+    return sorted((ids[h], codes_by_hmac[h]) for h in hmacs)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Bulk-provision contractor access codes")
+    ap.add_argument("--count", type=int, required=True, help="number of codes to create")
+    ap.add_argument("--status", choices=["trial", "active"], default="trial")
+    ap.add_argument("--trial-days", type=int, default=14, help="trial length (status=trial only)")
+    ap.add_argument("--length", type=int, default=8, help="code length")
+    ap.add_argument("--out", help="CSV path for the plaintext codes (default: stdout)")
+    args = ap.parse_args(argv)
+
+    if args.count <= 0:
+        ap.error("--count must be positive")
+
+    trial_ends_at = None
+    if args.status == "trial":
+        trial_ends_at = datetime.now(timezone.utc) + timedelta(days=args.trial_days)
+
+    # Fail on a bad path / permissions / existing file before any code goes live
+    try:
+        out = open(args.out, "x", newline="") if args.out else sys.stdout
+    except OSError as e:
+        ap.error(f"cannot create --out {args.out}: {e}")
+
+    rows: Optional[List[Tuple[int, str]]] = None
+    try:
+        with get_pool().connection() as conn:
+            codes_by_hmac = generate_unique_codes(conn, args.count, args.length)
+            rows = insert_codes(conn, codes_by_hmac, status=args.status, trial_ends_at=trial_ends_at)
+    except Exception as e:
+        if rows is None:
+            # insert_codes returns only after COMMIT, so no code went live;
+            # remove the empty CSV this run created
+            if out is not sys.stdout:
+                out.close()
+                os.remove(args.out)
+            raise
+        print(f"Error after the insert committed ({e}); writing the codes anyway", file=sys.stderr)
+    finally:
+        try:
+            # Once committed, the CSV is the only plaintext copy: write it even
+            # if we're unwinding from Ctrl-C
+            if rows is not None:
+                writer = csv.writer(out)
+                writer.writerow(["contractor_id", "access_code"])
+                writer.writerows(rows)
+            elif out is not sys.stdout and not out.closed:
+                print(
+                    f"Interrupted before the insert returned; {args.out} is empty. Check "
+                    "public.contractors before re-running: committed codes can only be "
+                    "recovered by decrypting access_code_encrypted.",
+                    file=sys.stderr,
+                )
+        finally:
+            if out is not sys.stdout:
+                out.close()
+            close_pool()
+
+    print(f"Provisioned {len(rows)} {args.status} access codes", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
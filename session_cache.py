@@ -0,0 +1,111 @@
+# session_cache.py
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional
+
+# ==========================================
+# CONFIG
+# ==========================================
+# Streamlit re-runs require_auth on every widget interaction. Validated
+# sessions are remembered here (process-wide) so most reruns skip Postgres.
+# TTL bounds how long a revocation made elsewhere (e.g. by the auth service)
+# can go unnoticed by this process.
+
+SESSION_CACHE_TTL_S = float(os.getenv("SESSION_CACHE_TTL_S", "60"))
+SESSION_CACHE_MAX_ENTRIES = int(os.getenv("SESSION_CACHE_MAX_ENTRIES", "10000"))
+
+
+@dataclass(frozen=True)
+class CachedSession:
+    session_id: int
+    contractor_id: int
+    valid_until: Optional[datetime]   # earliest of session expires_at / trial_ends_at
+    cached_until: float               # time.monotonic() deadline
+
+
+_lock = threading.Lock()
+_entries: "OrderedDict[str, CachedSession]" = OrderedDict()
+
+
+def _key(session_token: str) -> str:
+    # Don't keep raw session tokens in memory longer than needed
+    return hashlib.sha256(session_token.encode("utf-8")).hexdigest()
+
+
+def get_cached_session(session_token: str) -> Optional[CachedSession]:
+    key = _key(session_token)
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None:
+            return None
+
+        expired = entry.cached_until <= time.monotonic() or (
+            entry.valid_until is not None and entry.valid_until <= datetime.now(timezone.utc)
+        )
+        if expired:
+            del _entries[key]
+            return None
+
+        _entries.move_to_end(key)
+        return entry
+
+
+def cache_session(
+    session_token: str,
+    *,
+    session_id: int,
+    contractor_id: int,
+    expires_at: Optional[datetime],
+    entitlement_ends_at: Optional[datetime] = None,
+) -> None:
+    """
+    entitlement_ends_at: trial_ends_at for trial contractors, None for active ones.
+    """
+    deadlines = [d for d in (expires_at, entitlement_ends_at) if d is not None]
+    entry = CachedSession(
+        session_id=session_id,
+        contractor_id=contractor_id,
+        valid_until=min(deadlines) if deadlines else None,
+        cached_until=time.monotonic() + SESSION_CACHE_TTL_S,
+    )
+
+    key = _key(session_token)
+    with _lock:
+        _entries[key] = entry
+        _entries.move_to_end(key)
+        while len(_entries) > SESSION_CACHE_MAX_ENTRIES:
+            _entries.popitem(last=False)
+
+
+# ==========================================
+# INVALIDATION
+# ==========================================
+
+def invalidate_token(session_token: str) -> None:
+    with _lock:
+        _entries.pop(_key(session_token), None)
+
+
+def invalidate_session(session_id: int) -> None:
+    with _lock:
+        for key in [k for k, e in _entries.items() if e.session_id == session_id]:
+            del _entries[key]
+
+
+def invalidate_contractor(contractor_id: int) -> None:
+    """Drop every cached session for a contractor (e.g. subscription cancelled)."""
+    with _lock:
+        for key in [k for k, e in _entries.items() if e.contractor_id == contractor_id]:
+            del _entries[key]
+
+
+def clear_session_cache() -> None:
+    with _lock:
+        _entries.clear()
@@ -0,0 +1,33 @@
+# tests/test_bucket_rules.py
+from decimal import Decimal
+
+import pytest
+
+from bucket_rules import classify_by_rules
+from money_lines import MoneyLine
+
+
+def _bucket(text):
+    mapping, _resolved = classify_by_rules([MoneyLine(id=1, raw_line_no=1, text=text, amount=Decimal("100.00"))])
+    return mapping.get(1)
+
+
+@pytest.mark.parametrize("text, bucket", [
+    ("1. Tile floor covering 80.00 SF 9.50 760.00", "tile"),
+    ("2. Paint the walls - two coats 400.00 SF 0.95 380.00", "painting_interior"),
+    ("3. Overhead & Profit 1,200.00", "overhead_profit"),
+    ("4. Moisture meter reading 1.00 EA 45.00 45.00", "mitigation"),
+])
+def test_resolves_unambiguous_lines(text, bucket):
+    assert _bucket(text) == bucket
+
+
+@pytest.mark.parametrize("text", [
+    "5. Acoustic ceiling tile 120.00 SF 2.10 252.00",
+    "6. Prime & paint gutter / downspout 60.00 LF 1.45 87.00",
+    "7. Paint shutters - simple 4.00 EA 38.00 152.00",
+    "8. Paint garage door - 16' 1.00 EA 210.00 210.00",
+    "9. Moisture barrier 200.00 SF 0.40 80.00",
+])
+def test_leaves_exterior_and_lookalike_lines_to_the_llm(text):
+    assert _bucket(text) is None
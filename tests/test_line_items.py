@@ -0,0 +1,88 @@
+# tests/test_line_items.py
+from decimal import Decimal
+
+import pytest
+
+from bucket_cache import normalize_line_text
+from line_items import column_totals_by_bucket, extract_line_items, layout_from_header, parse_line_item
+
+
+def _fields(row, names):
+    return {k: str(getattr(row, k)) for k in names}
+
+
+@pytest.mark.parametrize("text, expected", [
+    pytest.param(
+        "DESCRIPTION QUANTITY UNIT PRICE TAX O&P RCV DEPREC. ACV\n"
+        "14. R&R Carpet pad 281.00 SF 0.64 12.59 17.98 210.41 (35.97) 174.44",
+        {"qty": "281.00", "unit": "SF", "unit_price": "0.64", "tax": "12.59", "o_and_p": "17.98",
+         "rcv": "210.41", "depreciation": "35.97", "acv": "174.44"},
+        id="standard layout",
+    ),
+    pytest.param(
+        "DESCRIPTION QUANTITY UNIT PRICE TAX O&P RCV AGE/LIFE COND. DEP % DEPREC. ACV\n"
+        "14. R&R Carpet pad 281.00 SF 0.64 12.59 17.98 210.41 5/10 yrs Avg. 50% (35.97) 174.44",
+        {"qty": "281.00", "unit": "SF", "unit_price": "0.64", "tax": "12.59", "o_and_p": "17.98",
+         "rcv": "210.41", "depreciation": "35.97", "acv": "174.44"},
+        id="depreciation layout",
+    ),
+    pytest.param(
+        "DESCRIPTION QUANTITY UNIT PRICE TAX O&P RCV AGE/LIFE COND. DEP % DEPREC. ACV\n"
+        "3. Dumpster rental 2.00 YR 100.00 7.00 10.00 217.00 0/NA Below Avg. 0% (0.00) 217.00",
+        {"qty": "2.00", "unit": "YR", "unit_price": "100.00", "rcv": "217.00",
+         "depreciation": "0.00", "acv": "217.00"},
+        id="no age (0/NA) and a YR unit",
+    ),
+    pytest.param(
+        "DESCRIPTION QUANTITY UNIT PRICE TAX O&P RCV AGE/LIFE COND. DEP % DEPREC. ACV\n"
+        "5. Water heater 1.00 EA 900.00 50.00 95.00 1,045.00 8/12 yrs Excellent 67% (700.15) 344.85",
+        {"qty": "1.00", "unit": "EA", "unit_price": "900.00", "tax": "50.00", "o_and_p": "95.00",
+         "rcv": "1045.00", "depreciation": "700.15", "acv": "344.85"},
+        id="excellent condition",
+    ),
+    pytest.param(
+        "DESCRIPTION QTY REPLACE TAX O&P TOTAL\n"
+        "7. Remove drywall 120.00 SF 0.52 3.28 12.64 78.32",
+        {"qty": "120.00", "unit": "SF", "unit_price": "0.52", "tax": "3.28", "o_and_p": "12.64",
+         "rcv": "78.32", "depreciation": "None", "acv": "None"},
+        id="replace / total header",
+    ),
+    pytest.param(
+        "DESCRIPTION QUANTITY UNIT PRICE TAX O&P RCV DEPREC. ACV\n"
+        "6. Thing 1,200.00 SF 1.00 1,205.00 <10.00> 1,195.00",
+        {"qty": "1200.00", "unit_price": "1.00", "tax": "None", "rcv": "1205.00",
+         "depreciation": "10.00", "acv": "1195.00"},
+        id="amount count doesn't match the header",
+    ),
+])
+def test_extract_line_items(text, expected):
+    rows = extract_line_items(text)
+    assert len(rows) == 1
+    assert _fields(rows[0], expected) == expected
+
+
+def test_replace_header_layout():
+    assert layout_from_header("DESCRIPTION QTY REPLACE TAX O&P TOTAL") == ("unit_price", "tax", "o_and_p", "rcv")
+
+
+def test_condition_words_match_cache_normalization():
+    # Every condition value the parser skips is also stripped from cache keys
+    for word in ("Excellent", "Average", "New", "Below Avg.", "Good", "Fair", "Poor"):
+        assert normalize_line_text(f"5. Water heater 1.00 EA 900.00 {word}") == "water heater"
+        row = parse_line_item(f"5. Water heater 1.00 EA 900.00 1,045.00 8/12 yrs {word} 67% (700.15) 344.85")
+        assert row is not None and row.acv == Decimal("344.85")
+
+
+def test_column_totals_by_bucket():
+    rows = extract_line_items(
+        "DESCRIPTION QUANTITY UNIT PRICE TAX O&P RCV DEPREC. ACV\n"
+        "1. Carpet 10.00 SF 2.00 1.40 2.00 23.40 (5.00) 18.40\n"
+        "2. Carpet pad 10.00 SF 1.00 0.70 1.00 11.70 (2.00) 9.70\n"
+        "3. Paint walls 100.00 SF 1.00 7.00 10.00 117.00 (0.00) 117.00"
+    )
+    totals = column_totals_by_bucket(rows, {1: "flooring_carpet", 2: "flooring_carpet", 3: "painting_interior"})
+    assert totals["flooring_carpet"] == {
+        "rows": 2, "tax": Decimal("2.10"), "o_and_p": Decimal("3.00"),
+        "rcv": Decimal("35.10"), "depreciation": Decimal("7.00"), "acv": Decimal("28.10"),
+    }
+    assert totals["painting_interior"]["rcv"] == Decimal("117.00")
@@ -0,0 +1,131 @@
+# usage_events.py
+from __future__ import annotations
+
+import atexit
+import os
+import queue
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from psycopg.types.json import Jsonb
+
+from db import get_pool
+
+# ==========================================
+# CONFIG
+# ==========================================
+# log_event() only enqueues; a background thread COPYs batches into
+# usage_events so the UI never waits on telemetry. When the queue is full
+# new events are dropped (and counted) rather than blocking the caller.
+
+USAGE_EVENT_QUEUE_MAX = int(os.getenv("USAGE_EVENT_QUEUE_MAX", "5000"))
+USAGE_EVENT_BATCH_MAX = int(os.getenv("USAGE_EVENT_BATCH_MAX", "500"))
+USAGE_EVENT_FLUSH_INTERVAL_S = float(os.getenv("USAGE_EVENT_FLUSH_INTERVAL_S", "2"))
+
+EventRow = Tuple[int, int, str, Dict[str, Any]]
+
+_queue: "queue.Queue[EventRow]" = queue.Queue(maxsize=USAGE_EVENT_QUEUE_MAX)
+
+_stats_lock = threading.Lock()
+_stats = {"enqueued": 0, "dropped": 0, "written": 0, "failed": 0}
+
+_stop = threading.Event()
+_start_lock = threading.Lock()
+_thread: Optional[threading.Thread] = None
+
+
+def _bump(key: str, n: int = 1) -> None:
+    with _stats_lock:
+        _stats[key] += n
+
+
+def usage_event_stats() -> Dict[str, int]:
+    """enqueued / dropped (queue full) / written / failed (DB error) counts, plus current backlog."""
+    with _stats_lock:
+        out = dict(_stats)
+    out["queued"] = _queue.qsize()
+    return out
+
+
+def enqueue_event(
+    contractor_id: int,
+    session_id: int,
+    event_type: str,
+    metadata: Optional[Dict[str, Any]] = None,
+) -> bool:
+    """Non-blocking. Returns False if the event was dropped because the queue is full."""
+    try:
+        _queue.put_nowait((contractor_id, session_id, event_type, metadata or {}))
+    except queue.Full:
+        _bump("dropped")
+        return False
+
+    _bump("enqueued")
+    _ensure_started()
+    return True
+
+
+def _write_batch(rows: List[EventRow]) -> None:
+    try:
+        with get_pool().connection() as conn:
+            with conn.cursor() as cur:
+                with cur.copy(
+                    "COPY usage_events (contractor_id, session_id, event_type, metadata) FROM STDIN"
+                ) as copy:
+                    for contractor_id, session_id, event_type, metadata in rows:
+                        copy.write_row((contractor_id, session_id, event_type, Jsonb(metadata)))
+    except Exception as e:
+        _bump("failed", len(rows))
+        print(f"Usage logging error ({len(rows)} events): {e}")
+        return
+
+    _bump("written", len(rows))
+
+
+def _drain(first: Optional[EventRow] = None) -> List[EventRow]:
+    batch: List[EventRow] = [first] if first is not None else []
+    while len(batch) < USAGE_EVENT_BATCH_MAX:
+        try:
+            batch.append(_queue.get_nowait())
+        except queue.Empty:
+            break
+    return batch
+
+
+def flush_usage_events() -> None:
+    """Write everything currently queued (used at shutdown)."""
+    while True:
+        batch = _drain()
+        if not batch:
+            return
+        _write_batch(batch)
+
+
+def _run() -> None:
+    while not _stop.is_set():
+        try:
+            first = _queue.get(timeout=USAGE_EVENT_FLUSH_INTERVAL_S)
+        except queue.Empty:
+            continue
+        _write_batch(_drain(first))
+
+
+def _ensure_started() -> None:
+    global _thread
+    if _thread is not None:
+        return
+    with _start_lock:
+        if _thread is None:
+            _thread = threading.Thread(target=_run, name="usage-event-writer", daemon=True)
+            _thread.start()
+
+
+def shutdown_usage_events() -> None:
+    """Stop the writer and flush the backlog."""
+    _stop.set()
+    if _thread is not None:
+        _thread.join(timeout=USAGE_EVENT_FLUSH_INTERVAL_S + 5)
+    flush_usage_events()
+
+
+atexit.register(shutdown_usage_events)